@@ -0,0 +1,60 @@
+"""
+Compare archive throughput of the available backup codecs.
+
+Usage: python -m benchmarks.archive_codecs [world_dir]
+Without a world directory a synthetic one with partly compressible region files is generated.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from mc_server_interaction.utils.archive import ArchiveCodec, create_archive, extract_archive, zstandard
+
+
+def create_synthetic_world(path: Path, region_files: int = 64, region_size: int = 8 * 1024 * 1024):
+    region_dir = path / "region"
+    region_dir.mkdir(parents=True)
+    for i in range(region_files):
+        with open(region_dir / f"r.{i}.0.mca", "wb") as f:
+            f.write(os.urandom(region_size // 2))
+            f.write(bytes(region_size // 2))
+
+
+async def main():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir)
+        if len(sys.argv) > 1:
+            world = Path(sys.argv[1])
+        else:
+            world = temp_dir / "world"
+            create_synthetic_world(world)
+        total = sum(f.stat().st_size for f in world.rglob("*") if f.is_file())
+
+        codecs = [ArchiveCodec.ZIP, ArchiveCodec.TAR]
+        if zstandard is not None:
+            codecs.append(ArchiveCodec.TAR_ZSTD)
+
+        print(f"{total / 1024 ** 2:.0f} MiB of world data")
+        print(f"{'codec':<10}{'ratio':>8}{'archive MiB/s':>16}{'extract MiB/s':>16}")
+        for codec in codecs:
+            archive = temp_dir / f"backup.{codec}"
+            start = time.perf_counter()
+            await create_archive(world, archive, codec)
+            archive_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            await extract_archive(archive, temp_dir / f"restore_{codec}")
+            extract_time = time.perf_counter() - start
+
+            print(
+                f"{codec:<10}{archive.stat().st_size / total:>8.2f}"
+                f"{total / 1024 ** 2 / archive_time:>16.1f}{total / 1024 ** 2 / extract_time:>16.1f}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,53 @@
+"""
+Compare the throughput of the log event parser with the substring checks previously used for status detection.
+
+Usage: python -m benchmarks.log_parsing
+"""
+
+import random
+import time
+
+from mc_server_interaction.manager import ServerManager  # noqa: F401, loads the packages in dependency order
+from mc_server_interaction.interaction.log_events import LogEventParser
+
+SAMPLE_LINES = [
+    "[12:00:01] [Server thread/INFO]: Preparing spawn area: 83%",
+    "[12:00:01] [Worker-Main-3/INFO]: Preparing spawn area: 0%",
+    '[12:00:01] [Server thread/INFO]: Done (12.345s)! For help, type "help"',
+    "[12:00:01] [User Authenticator #1/INFO]: UUID of player Steve is 069a79f4-44e9-4726-a5be-fca90e38aaf5",
+    "[12:00:01] [Server thread/INFO]: Steve[/127.0.0.1:51234] logged in with entity id 123 at (0.5, 64.0, 0.5)",
+    "[12:00:01] [Server thread/INFO]: Steve joined the game",
+    "[12:00:01] [Server thread/INFO]: <Steve> hello there",
+    "[12:00:01] [Server thread/INFO]: Steve was slain by Zombie",
+    "[12:00:01] [Server thread/INFO]: Steve has made the advancement [Stone Age]",
+    "[12:00:01] [Server thread/WARN]: Can't keep up! Is the server overloaded? Running 2011ms or 40 ticks behind",
+    "[12:00:01] [Server thread/INFO]: Steve left the game",
+    "[12:00:01] [Server thread/INFO]: Saved the game",
+]
+
+
+def substring_checks(line: str):
+    # the checks _update_status_callback ran against every line before the parser existed
+    return (
+        'For help, type "help"' in line,
+        "[Server thread/INFO]: Stopping the server" in line,
+        "[Server thread/INFO]: ThreadedAnvilChunkStorage: All dimensions are saved" in line,
+    )
+
+
+def measure(func, lines) -> float:
+    start = time.perf_counter()
+    for line in lines:
+        func(line)
+    return len(lines) / (time.perf_counter() - start)
+
+
+def main():
+    lines = [random.choice(SAMPLE_LINES) for _ in range(500_000)]
+    parser = LogEventParser()
+    print(f"substring checks (status only): {measure(substring_checks, lines):>12,.0f} lines/s")
+    print(f"LogEventParser (all events):    {measure(parser.parse, lines):>12,.0f} lines/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Compare the cost of sampling the resource usage of many server processes.
+
+Usage: python -m benchmarks.resource_sampling [processes] [heap_mib] [mappings]
+Starts dummy processes which each touch heap_mib of memory spread over separate mappings, like the many mappings
+of a JVM, and measures the time per server of the previous per-process sampling (virtual_memory and
+memory_full_info for every server) against one ResourceSampler pass in every memory mode.
+
+Then every process gets a metrics job on a scheduler with its own phase, like the servers of a manager, which
+reads its usage every second. Reading through a pass cache shared by all servers, where every job finding the cache
+older than half a second starts a new pass, is compared against the shared sampler job.
+"""
+
+import asyncio
+import random
+import subprocess
+import sys
+import time
+from typing import Tuple
+
+import psutil
+
+from mc_server_interaction.manager import ServerManager  # noqa: F401, loads the packages in dependency order
+from mc_server_interaction.interaction.resource_sampler import MemoryMode, ResourceSampler
+from mc_server_interaction.utils.scheduler import Scheduler
+
+ROUNDS = 20
+SCHEDULED_SECONDS = 5
+WARMUP_SECONDS = 2
+
+
+DUMMY_PROCESS = """
+import mmap, sys, time
+size = max(int(sys.argv[1]) * 1024 * 1024 // int(sys.argv[2]), mmap.PAGESIZE)
+maps = []
+for i in range(int(sys.argv[2])):
+    # alternating shared and private mappings keeps the kernel from merging neighbouring mappings
+    m = mmap.mmap(-1, size, flags=mmap.MAP_SHARED if i % 2 else mmap.MAP_PRIVATE)
+    m.write(b"x" * size)
+    maps.append(m)
+time.sleep(600)
+"""
+
+
+def start_processes(count: int, heap_mib: int, mappings: int):
+    return [
+        subprocess.Popen([sys.executable, "-c", DUMMY_PROCESS, str(heap_mib), str(mappings)]) for _ in range(count)
+    ]
+
+
+def sample_per_process(processes):
+    for process in processes:
+        psutil.virtual_memory()
+        process.memory_full_info()
+        process.cpu_percent()
+
+
+async def run_metric_jobs(scheduler: Scheduler, sampler: ResourceSampler, pids, read) -> Tuple[float, float]:
+    """
+    :return: Processes sampled per server and second, cpu time per second of this process
+    """
+    sampled = 0
+    sample_process = sampler._sample_process
+
+    def counting_sample_process(process):
+        nonlocal sampled
+        sampled += 1
+        return sample_process(process)
+
+    sampler._sample_process = counting_sample_process
+    rnd = random.Random(0)
+
+    def metrics_job(pid):
+        async def update_system_metrics():
+            read(pid)
+        return update_system_metrics
+
+    jobs = [scheduler.add_job(metrics_job(pid), 1, rnd.random()) for pid in pids]
+    # the first read of every process happens outside of a shared pass
+    await asyncio.sleep(WARMUP_SECONDS)
+    sampled = 0
+    start = time.process_time()
+    await asyncio.sleep(SCHEDULED_SECONDS)
+    cpu = (time.process_time() - start) / SCHEDULED_SECONDS
+    for job in jobs:
+        scheduler.remove_job(job)
+    return sampled / len(pids) / SCHEDULED_SECONDS, cpu
+
+
+async def compare_scheduled(pids):
+    # previous behaviour: one pass of all processes, reused for half a second
+    scheduler = Scheduler()
+    sampler = ResourceSampler(scheduler=scheduler)
+    sampled_at = 0.0
+
+    def read_pass_cache(pid):
+        nonlocal sampled_at
+        if time.monotonic() - sampled_at > 0.5:
+            sampler.sample()
+            sampled_at = time.monotonic()
+
+    for pid in pids:
+        # without the shared job
+        sampler._pids[pid] = psutil.Process(pid)
+    per_second, cpu = await run_metric_jobs(scheduler, sampler, pids, read_pass_cache)
+    print(f"{'pass cache':<20}{per_second:>24.1f}{cpu * 100:>16.1f}")
+
+    scheduler = Scheduler()
+    sampler = ResourceSampler(scheduler=scheduler)
+    for pid in pids:
+        sampler.add(pid)
+    per_second, cpu = await run_metric_jobs(scheduler, sampler, pids, sampler.get)
+    print(f"{'shared job':<20}{per_second:>24.1f}{cpu * 100:>16.1f}")
+    for pid in pids:
+        sampler.remove(pid)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    heap_mib = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+    mappings = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+    children = start_processes(count, heap_mib, mappings)
+    try:
+        time.sleep(1)
+        processes = [psutil.Process(child.pid) for child in children]
+
+        print(f"{count} processes with {heap_mib} MiB in {mappings} mappings each, {ROUNDS} rounds")
+        print(f"{'method':<20}{'us per server':>16}")
+        start = time.perf_counter()
+        for _ in range(ROUNDS):
+            sample_per_process(processes)
+        print(f"{'per process (uss)':<20}{(time.perf_counter() - start) / ROUNDS / count * 1e6:>16.1f}")
+
+        for mode in (MemoryMode.RSS, MemoryMode.PSS, MemoryMode.USS):
+            sampler = ResourceSampler(mode)
+            for child in children:
+                sampler.add(child.pid)
+            start = time.perf_counter()
+            for _ in range(ROUNDS):
+                sampler.sample()
+            print(f"{'sampler (' + mode + ')':<20}{(time.perf_counter() - start) / ROUNDS / count * 1e6:>16.1f}")
+
+        print(f"\n{count} metric jobs reading every second for {SCHEDULED_SECONDS} seconds")
+        print(f"{'method':<20}{'samples per server/s':>24}{'cpu %':>16}")
+        asyncio.run(compare_scheduled([child.pid for child in children]))
+    finally:
+        for child in children:
+            child.kill()
+            child.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Measure how long restarting a server takes on top of the time the server itself needs.
+
+Usage: python -m benchmarks.restart_latency [rounds]
+A fake java executable is put first on the PATH. It prints the startup and shutdown messages of a vanilla server
+with fixed delays, so the measured time minus those delays is the latency added by the library.
+"""
+
+import asyncio
+import os
+import stat
+import statistics
+import sys
+import tempfile
+import time
+
+from mc_server_interaction.manager import ServerManager  # noqa: F401, loads the packages in dependency order
+from mc_server_interaction.interaction.models import ServerConfig, ServerStatus
+from mc_server_interaction.interaction.server_interaction import MinecraftServer
+
+START_DELAY = 0.2
+SAVE_DELAY = 0.1
+EXIT_DELAY = 0.1
+
+FAKE_JAVA = f"""#!{sys.executable}
+import sys, time
+def log(message):
+    print("[12:00:00] [Server thread/INFO]: " + message, flush=True)
+time.sleep({START_DELAY})
+log('Done (0.2s)! For help, type "help"')
+for line in sys.stdin:
+    if line.strip() == "stop":
+        log("Stopping the server")
+        time.sleep({SAVE_DELAY})
+        log("ThreadedAnvilChunkStorage: All dimensions are saved")
+        # the JVM keeps running for a moment after the last message
+        time.sleep({EXIT_DELAY})
+        break
+"""
+
+
+def setup(directory: str) -> ServerConfig:
+    bin_dir = os.path.join(directory, "bin")
+    os.mkdir(bin_dir)
+    java = os.path.join(bin_dir, "java")
+    with open(java, "w") as f:
+        f.write(FAKE_JAVA)
+    os.chmod(java, os.stat(java).st_mode | stat.S_IEXEC)
+    os.environ["PATH"] = bin_dir + os.pathsep + os.environ["PATH"]
+
+    server_path = os.path.join(directory, "server")
+    os.makedirs(os.path.join(server_path, "worlds"))
+    open(os.path.join(server_path, "server.jar"), "w").close()
+    with open(os.path.join(server_path, "server.properties"), "w") as f:
+        f.write("level-name=worlds/world\nserver-port=25565\n")
+    return ServerConfig(server_path, "benchmark", "1.19.4", persist_metrics=False)
+
+
+async def wait_for_status(server: MinecraftServer, status: ServerStatus):
+    while server.status != status:
+        await asyncio.sleep(0.001)
+
+
+async def main(rounds: int):
+    with tempfile.TemporaryDirectory() as directory:
+        server = MinecraftServer(setup(directory))
+        await server.start()
+        await wait_for_status(server, ServerStatus.RUNNING)
+        shutdowns = []
+        restarts = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            await server.shutdown()
+            shutdowns.append(time.perf_counter() - start)
+            await server.start()
+            await wait_for_status(server, ServerStatus.RUNNING)
+            restarts.append(time.perf_counter() - start)
+        await server.shutdown()
+
+    server_time = SAVE_DELAY + EXIT_DELAY
+    print(f"{rounds} restarts, the fake server needs {server_time * 1000:.0f} ms to stop "
+          f"and {START_DELAY * 1000:.0f} ms to start")
+    print(f"shutdown: median {statistics.median(shutdowns) * 1000:7.1f} ms, "
+          f"added {(statistics.median(shutdowns) - server_time) * 1000:7.1f} ms")
+    print(f"restart:  median {statistics.median(restarts) * 1000:7.1f} ms, "
+          f"added {(statistics.median(restarts) - server_time - START_DELAY) * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 10))
@@ -0,0 +1,59 @@
+"""
+Compare the startup time of a server with different launch profiles, with and without a CDS archive.
+
+Usage: python -m benchmarks.startup_time <server_dir> <version> [rounds] [java_path]
+The server directory needs an installed server with an accepted eula. Every variant is started rounds + 1 times,
+the first start only warms up the world files and generates the CDS archive and is not counted.
+Reports the median time from start() until the server is running and the startup time printed by the server.
+"""
+
+import asyncio
+import statistics
+import sys
+import time
+
+from mc_server_interaction.manager import ServerManager  # noqa: F401, loads the packages in dependency order
+from mc_server_interaction.interaction.log_events import ServerEventType
+from mc_server_interaction.interaction.models import LaunchProfile, ServerConfig, ServerStatus
+from mc_server_interaction.interaction.server_interaction import MinecraftServer
+
+STARTUP_TIMEOUT = 600
+
+
+async def measure(config: ServerConfig, rounds: int):
+    server = MinecraftServer(config)
+    totals = []
+    reported = []
+    for i in range(rounds + 1):
+        started = server.expect_event(ServerEventType.STARTED)
+        start = time.perf_counter()
+        await server.start()
+        await server.wait_until(ServerStatus.RUNNING, STARTUP_TIMEOUT)
+        total = time.perf_counter() - start
+        event = await started
+        await server.shutdown()
+        if i > 0:
+            totals.append(total)
+            reported.append(event.data["startup_time"])
+    return statistics.median(totals), statistics.median(reported)
+
+
+async def main(path: str, version: str, rounds: int, java_path: str):
+    print(f"{'profile':<10} {'cds':<5} {'start() to running':>20} {'reported by server':>20}")
+    for profile in LaunchProfile.ALL:
+        for use_cds in (False, True):
+            config = ServerConfig(
+                path, "benchmark", version, persist_metrics=False, java_path=java_path, launch_profile=profile,
+                use_cds=use_cds,
+            )
+            total, reported = await measure(config, rounds)
+            print(f"{profile:<10} {str(use_cds):<5} {total:19.2f}s {reported:19.2f}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(
+        sys.argv[1],
+        sys.argv[2],
+        int(sys.argv[3]) if len(sys.argv) > 3 else 3,
+        sys.argv[4] if len(sys.argv) > 4 else "java",
+    ))
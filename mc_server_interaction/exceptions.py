@@ -14,6 +14,10 @@ class ServerRunningException(MCServerInteractionException):
     pass
 
 
+class ServerNotRunningException(MCServerInteractionException):
+    pass
+
+
 class UnsupportedVersionException(MCServerInteractionException):
     pass
 
@@ -24,3 +28,15 @@ class NotAWorldFolderException(MCServerInteractionException):
 
 class WorldExistsException(MCServerInteractionException):
     pass
+
+
+class UnsupportedCodecException(MCServerInteractionException):
+    pass
+
+
+class RconException(MCServerInteractionException):
+    pass
+
+
+class InsufficientMemoryException(MCServerInteractionException):
+    pass
@@ -0,0 +1,153 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import Iterable, List, Optional, Tuple
+
+from mc_server_interaction.exceptions import ServerNotRunningException
+
+
+class CommandPriority:
+    # not rate limited and sent before everything else, e.g. stop
+    HIGH = 0
+    NORMAL = 1
+    # sent when nothing else is waiting, e.g. periodic queries
+    LOW = 2
+
+
+class CommandQueue:
+    """
+    Writes commands to the stdin of a server process. Commands which are queued at the same time are written as
+    one buffer with a single drain, in order of priority. A token bucket limits how many commands per second reach
+    the server, since the server runs all console commands received during a tick within that tick.
+    """
+
+    max_batch = 1000
+    # when rate limited, wait for the tokens of one server tick instead of writing every command on its own
+    batch_interval = 0.05
+
+    def __init__(
+            self,
+            stdin: asyncio.StreamWriter,
+            server_name: str,
+            rate: float = 0,
+            burst: int = 1,
+    ):
+        """
+        :param stdin: The stdin of the server process
+        :param server_name: Name of the server used for logging
+        :param rate: Commands per second, 0 for no limit
+        :param burst: Number of commands which can be sent at once after the queue was idle
+        """
+        self.logger = logging.getLogger(f"MCServerInteraction.{self.__class__.__name__}:{server_name}")
+        self.stdin = stdin
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._refilled_at = time.monotonic()
+        self._queue: List[Tuple[int, int, bytes, asyncio.Future]] = []
+        # the batch being written, close() fails it when the writing task is cancelled
+        self._batch: List[Tuple[bytes, asyncio.Future]] = []
+        self._counter = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+
+    def __len__(self):
+        return len(self._queue)
+
+    def submit(self, command: str, priority: int = CommandPriority.NORMAL) -> asyncio.Future:
+        """
+        Queue a command.
+        :param command: The command without line break
+        :param priority: One of CommandPriority, commands of the same priority are sent in order
+        :return: Future which is done when the command was written. It fails with ServerNotRunningException if the
+            process exited before, and with the error if writing failed
+        """
+        future = asyncio.get_event_loop().create_future()
+        if self._closed:
+            future.set_exception(ServerNotRunningException("The server process exited"))
+            return future
+        line = command if command.endswith("\n") else command + "\n"
+        heapq.heappush(self._queue, (priority, next(self._counter), line.encode("utf-8"), future))
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+        self._wakeup.set()
+        return future
+
+    def submit_many(self, commands: Iterable[str], priority: int = CommandPriority.NORMAL) -> List[asyncio.Future]:
+        return [self.submit(command, priority) for command in commands]
+
+    def close(self):
+        """
+        Fail all queued commands and the commands being written, called when the process exited.
+        """
+        self._closed = True
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        futures = [future for _, future in self._batch] + [future for _, _, _, future in self._queue]
+        for future in futures:
+            if not future.done():
+                future.set_exception(ServerNotRunningException("The server process exited"))
+        self._batch = []
+        self._queue = []
+
+    async def _run(self):
+        while True:
+            if not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            batch = self._take_batch()
+            if not batch and self._queue:
+                # wait for more tokens or a command of high priority
+                needed = min(len(self._queue), self.burst, max(1, int(self.rate * self.batch_interval)))
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), (needed - self._tokens) / self.rate)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            if not batch:
+                # only cancelled commands were queued
+                continue
+            self._batch = batch
+            self.stdin.write(b"".join(line for line, _ in batch))
+            try:
+                await self.stdin.drain()
+            except (ConnectionError, OSError) as e:
+                self.logger.warning(f"Could not write commands: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                self.close()
+                return
+            self._batch = []
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+
+    def _take_batch(self) -> List[Tuple[bytes, asyncio.Future]]:
+        self._refill()
+        batch = []
+        while self._queue and len(batch) < self.max_batch:
+            priority, _, line, future = self._queue[0]
+            if future.cancelled():
+                heapq.heappop(self._queue)
+                continue
+            if priority != CommandPriority.HIGH and self.rate > 0:
+                if self._tokens < 1:
+                    break
+                self._tokens -= 1
+            heapq.heappop(self._queue)
+            batch.append((line, future))
+        return batch
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.rate > 0:
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
@@ -0,0 +1,254 @@
+import os
+import re
+from dataclasses import dataclass
+from typing import BinaryIO, List, Optional, Tuple
+
+from mc_server_interaction.interaction.metrics import Histogram
+
+# file name in the server directory
+GC_LOG_FILE = "gc.log"
+
+
+def gc_log_flag(file_name: str = GC_LOG_FILE) -> str:
+    """
+    Unified JVM logging (Java 9+) of all gc tags, with the decorations GcLogParser expects.
+    """
+    return f"-Xlog:gc*:file={file_name}:uptime,level,tags:filecount=5,filesize=20m"
+
+
+@dataclass
+class GcEvent:
+    gc_id: int
+    # seconds since the JVM started
+    uptime: float
+    # e.g. "Pause Young (Normal)", "Pause Full" or "Minor Collection"
+    name: str
+    cause: Optional[str]
+    # None for collections which only report the heap, like the summary of a mostly concurrent ZGC cycle
+    pause_ms: Optional[float]
+    # heap sizes in MiB, None for pauses which do not report the heap, like the pause phases of ZGC
+    heap_before: Optional[float]
+    heap_after: Optional[float]
+    heap_committed: Optional[float]
+    # MiB per second allocated since the previous collection
+    allocation_rate: Optional[float] = None
+
+
+_LINE = re.compile(r"^\[(\d+(?:[.,]\d+)?)s\]\[\w+\s*\]\[[\w,]+\s*\] ?(.*)$")
+_SIZE = r"(\d+(?:[.,]\d+)?)([BKMG])"
+# G1, Parallel and Serial: GC(0) Pause Young (Normal) (G1 Evacuation Pause) 24M->4M(256M) 5.123ms
+_PAUSE_WITH_HEAP = re.compile(
+    rf"GC\((\d+)\) (Pause .*?) {_SIZE}->{_SIZE}\({_SIZE}\) (\d+(?:[.,]\d+)?)ms$"
+)
+# ZGC: GC(0) Pause Mark Start 0.012ms, generational ZGC: GC(3) Y: Pause Mark Start (Major) 0.012ms,
+# Shenandoah: GC(1) Pause Init Mark (unload classes) 0.123ms
+_PAUSE = re.compile(r"GC\((\d+)\) (?:[YOyo]: )?(Pause [A-Za-z ]+?(?: \([^)]*\))?) (\d+(?:[.,]\d+)?)ms$")
+# ZGC: GC(0) Minor Collection (Allocation Rate) 120M(6%)->40M(2%) 0.055s
+_COLLECTION = re.compile(
+    rf"GC\((\d+)\) ((?:Major |Minor )?(?:Garbage )?Collection) \(([^)]*)\) {_SIZE}\(\d+%\)->{_SIZE}\(\d+%\)"
+)
+_UNITS = {"B": 1 / 1024 / 1024, "K": 1 / 1024, "M": 1, "G": 1024}
+
+
+def _mib(value: str, unit: str) -> float:
+    return float(value.replace(",", ".")) * _UNITS[unit]
+
+
+def _split_name(text: str) -> Tuple[str, Optional[str]]:
+    """
+    Split "Pause Young (Normal) (G1 Evacuation Pause)" into the name "Pause Young (Normal)" and the cause, which is
+    the last parenthesized group.
+    """
+    groups = []
+    depth = 0
+    start = 0
+    base_end = None
+    for i, char in enumerate(text):
+        if char == "(":
+            if depth == 0:
+                start = i
+                if base_end is None:
+                    base_end = i
+            depth += 1
+        elif char == ")" and depth > 0:
+            depth -= 1
+            if depth == 0:
+                groups.append(text[start:i + 1])
+    if not groups:
+        return text.strip(), None
+    name = " ".join([text[:base_end].strip()] + groups[:-1])
+    return name, groups[-1][1:-1]
+
+
+class GcLogParser:
+    """
+    Parses the lines of a unified JVM GC log written with the decorations of gc_log_flag into GcEvents.
+    The allocation rate is derived from the heap before a collection and the heap after the previous one.
+    """
+
+    def __init__(self):
+        self._last_heap: Optional[Tuple[float, float]] = None
+
+    def parse(self, line: str) -> Optional[GcEvent]:
+        match = _LINE.match(line)
+        if match is None:
+            return None
+        uptime = float(match.group(1).replace(",", "."))
+        message = match.group(2)
+        if not message.startswith("GC("):
+            return None
+
+        pause = _PAUSE_WITH_HEAP.match(message)
+        if pause is not None:
+            name, cause = _split_name(pause.group(2))
+            event = GcEvent(
+                int(pause.group(1)), uptime, name, cause, float(pause.group(9).replace(",", ".")),
+                _mib(pause.group(3), pause.group(4)), _mib(pause.group(5), pause.group(6)),
+                _mib(pause.group(7), pause.group(8)),
+            )
+        else:
+            pause = _PAUSE.match(message)
+            collection = _COLLECTION.match(message) if pause is None else None
+            if pause is not None:
+                return GcEvent(
+                    int(pause.group(1)), uptime, pause.group(2), None, float(pause.group(3).replace(",", ".")),
+                    None, None, None,
+                )
+            if collection is None:
+                return None
+            event = GcEvent(
+                int(collection.group(1)), uptime, collection.group(2), collection.group(3), None,
+                _mib(collection.group(4), collection.group(5)), _mib(collection.group(6), collection.group(7)), None,
+            )
+
+        if self._last_heap is not None and uptime > self._last_heap[0]:
+            allocated = max(0.0, event.heap_before - self._last_heap[1])
+            event.allocation_rate = allocated / (uptime - self._last_heap[0])
+        self._last_heap = (uptime, event.heap_after)
+        return event
+
+
+class GcLogTailer:
+    """
+    Reads a GC log incrementally while the JVM writes it. Follows the rotation of the log by the JVM and ignores
+    a log left over from a previous run.
+    """
+
+    def __init__(self, path: str, not_before: float = 0):
+        """
+        :param path: Path of the log file
+        :param not_before: Unix time, log files last modified before are ignored
+        """
+        self.path = path
+        self.not_before = not_before
+        self.parser = GcLogParser()
+        self._file: Optional[BinaryIO] = None
+        self._inode: Optional[int] = None
+        self._partial = b""
+
+    def read(self) -> List[GcEvent]:
+        """
+        :return: The events of all complete lines written since the last call
+        """
+        events: List[GcEvent] = []
+        if self._file is None and not self._open():
+            return events
+        events += self._read_lines()
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return events
+        if stat.st_ino != self._inode:
+            # the JVM rotated the log, read what it appended to the old file since the read above before closing it
+            events += self._read_lines()
+            events += self._flush_partial()
+            self.close()
+            if self._open():
+                events += self._read_lines()
+        elif stat.st_size < self._file.tell():
+            # truncated
+            self._file.seek(0)
+            self._partial = b""
+        return events
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+        self._file = None
+        self._inode = None
+        self._partial = b""
+
+    def _open(self) -> bool:
+        try:
+            stat = os.stat(self.path)
+            if stat.st_mtime < self.not_before:
+                return False
+            self._file = open(self.path, "rb")
+        except FileNotFoundError:
+            return False
+        self._inode = os.fstat(self._file.fileno()).st_ino
+        return True
+
+    def _flush_partial(self) -> List[GcEvent]:
+        """
+        Parse the last line of a file which was not terminated by a line break.
+        """
+        line, self._partial = self._partial, b""
+        event = self.parser.parse(line.decode("utf-8", "replace").rstrip("\r")) if line else None
+        return [] if event is None else [event]
+
+    def _read_lines(self) -> List[GcEvent]:
+        data = self._file.read()
+        if not data:
+            return []
+        lines = (self._partial + data).split(b"\n")
+        self._partial = lines.pop()
+        events = []
+        for line in lines:
+            event = self.parser.parse(line.decode("utf-8", "replace").rstrip("\r"))
+            if event is not None:
+                events.append(event)
+        return events
+
+
+class GcStats:
+    """
+    Histograms of the GC pauses, the heap after collections, which approximates the live data, and the allocation
+    rate of a server since it was started.
+    """
+
+    # milliseconds
+    pause_bounds = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+    # MiB
+    heap_bounds = (32, 64, 128, 256, 512, 1024, 2048, 3072, 4096, 6144, 8192, 12288, 16384, 24576, 32768)
+    # MiB per second
+    allocation_rate_bounds = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.pauses = Histogram(self.pause_bounds)
+        self.heap_after = Histogram(self.heap_bounds)
+        self.allocation_rate = Histogram(self.allocation_rate_bounds)
+        self.heap_committed: Optional[float] = None
+        self.last_event: Optional[GcEvent] = None
+
+    def add(self, event: GcEvent):
+        if event.pause_ms is not None:
+            self.pauses.add(event.pause_ms)
+        if event.heap_after is not None:
+            self.heap_after.add(event.heap_after)
+        if event.heap_committed is not None:
+            self.heap_committed = event.heap_committed
+        if event.allocation_rate is not None:
+            self.allocation_rate.add(event.allocation_rate)
+        self.last_event = event
+
+    def summary(self) -> dict:
+        return {
+            "pause_ms": self.pauses.to_dict(),
+            "heap_after_mib": self.heap_after.to_dict(),
+            "allocation_rate_mib_s": self.allocation_rate.to_dict(),
+            "heap_committed_mib": self.heap_committed,
+        }
@@ -0,0 +1,139 @@
+import hashlib
+import logging
+import os
+import shutil
+import uuid
+from typing import List, Optional, Tuple
+
+from mc_server_interaction.interaction.gc_log import gc_log_flag
+from mc_server_interaction.interaction.models import LaunchProfile, ServerConfig
+from mc_server_interaction.paths import cache_dir
+
+logger = logging.getLogger("MCServerInteraction.Launch")
+
+cds_dir = cache_dir / "cds"
+
+_AIKAR_FLAGS = [
+    "-XX:+UseG1GC",
+    "-XX:+ParallelRefProcEnabled",
+    "-XX:MaxGCPauseMillis=200",
+    "-XX:+UnlockExperimentalVMOptions",
+    "-XX:+DisableExplicitGC",
+    "-XX:+AlwaysPreTouch",
+    "-XX:G1HeapWastePercent=5",
+    "-XX:G1MixedGCCountTarget=4",
+    "-XX:G1MixedGCLiveThresholdPercent=90",
+    "-XX:G1RSetUpdatingPauseTimePercent=5",
+    "-XX:SurvivorRatio=32",
+    "-XX:+PerfDisableSharedMem",
+    "-XX:MaxTenuringThreshold=1",
+]
+
+# young generation and region sizes of Aikar's flags for heaps up to and above 12 GB
+_AIKAR_SIZE_FLAGS = {
+    False: [
+        "-XX:G1NewSizePercent=30",
+        "-XX:G1MaxNewSizePercent=40",
+        "-XX:G1HeapRegionSize=8M",
+        "-XX:G1ReservePercent=20",
+        "-XX:InitiatingHeapOccupancyPercent=15",
+    ],
+    True: [
+        "-XX:G1NewSizePercent=40",
+        "-XX:G1MaxNewSizePercent=50",
+        "-XX:G1HeapRegionSize=16M",
+        "-XX:G1ReservePercent=15",
+        "-XX:InitiatingHeapOccupancyPercent=20",
+    ],
+}
+
+_ZGC_FLAGS = [
+    "-XX:+UseZGC",
+    "-XX:+ZGenerational",
+    "-XX:+AlwaysPreTouch",
+    "-XX:+DisableExplicitGC",
+    "-XX:+PerfDisableSharedMem",
+]
+
+
+def profile_flags(profile: str, ram: int) -> List[str]:
+    """
+    :param profile: One of LaunchProfile
+    :param ram: Heap size in MiB
+    :return: The JVM flags of the profile without heap size flags
+    """
+    if profile == LaunchProfile.DEFAULT:
+        return []
+    if profile == LaunchProfile.AIKAR:
+        return _AIKAR_FLAGS + _AIKAR_SIZE_FLAGS[ram > 12 * 1024]
+    if profile == LaunchProfile.ZGC:
+        return list(_ZGC_FLAGS)
+    raise ValueError(f"Unknown launch profile {profile}, expected one of {', '.join(LaunchProfile.ALL)}")
+
+
+def cds_archive_path(server_config: ServerConfig) -> Optional[str]:
+    """
+    Path of the AppCDS archive for the version, launch profile and java binary of the server. An archive only
+    works with the JVM build it was created with, so the key includes the path, size and modification time of the
+    java binary, which change on every JDK update.
+    :return: The path, None if the java binary was not found
+    """
+    java = shutil.which(server_config.java_path)
+    if java is None:
+        return None
+    java = os.path.realpath(java)
+    stat = os.stat(java)
+    java_id = hashlib.sha1(f"{java}:{stat.st_size}:{stat.st_mtime_ns}".encode("utf-8")).hexdigest()[:12]
+    return str(cds_dir / f"{server_config.version}-{server_config.launch_profile}-{java_id}.jsa")
+
+
+def build_command(
+        server_config: ServerConfig,
+        jar_path: str,
+        gc_log: Optional[str] = None,
+) -> Tuple[List[str], Optional[str]]:
+    """
+    Build the command starting the server.
+    :param server_config: The config of the server
+    :param jar_path: Path of the server jar
+    :param gc_log: Write a GC log to this file, needs Java 9+
+    :return: The command and, if the server generates a new CDS archive, the temporary path it is written to when
+        the JVM exits. Pass it to publish_cds_archive after the process exited.
+    """
+    command = [
+        server_config.java_path,
+        f"-Xmx{server_config.ram}M",
+        f"-Xms{server_config.ram}M",
+    ]
+    command += profile_flags(server_config.launch_profile, server_config.ram)
+    temp_archive = None
+    if server_config.use_cds:
+        archive = cds_archive_path(server_config)
+        if archive is None:
+            logger.warning(f"Java binary {server_config.java_path} not found, not using CDS")
+        elif os.path.exists(archive):
+            command.append(f"-XX:SharedArchiveFile={archive}")
+        else:
+            # servers of the same version may generate an archive at the same time, each writes its own file
+            cds_dir.mkdir(parents=True, exist_ok=True)
+            temp_archive = f"{archive}.{uuid.uuid4().hex}.tmp"
+            command.append(f"-XX:ArchiveClassesAtExit={temp_archive}")
+    if gc_log is not None:
+        command.append(gc_log_flag(gc_log))
+    command += server_config.extra_jvm_args
+    command += ["-jar", jar_path, "--nogui"]
+    return command, temp_archive
+
+
+def publish_cds_archive(temp_archive: str, returncode: Optional[int]):
+    """
+    Move a CDS archive written at exit of the JVM to its final path, only after a clean shutdown.
+    """
+    if not os.path.exists(temp_archive):
+        return
+    if returncode != 0:
+        os.remove(temp_archive)
+        return
+    archive = temp_archive.rsplit(".", 2)[0]
+    os.replace(temp_archive, archive)
+    logger.info(f"Created CDS archive {archive}")
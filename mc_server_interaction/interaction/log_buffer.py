@@ -0,0 +1,196 @@
+import zlib
+from array import array
+from collections import deque
+from typing import Iterator, List, Optional, Tuple, Union
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class LogBuffer:
+    """
+    Ring buffer for console output lines.
+
+    Lines are stored utf-8 encoded in a byte buffer and addressed by a sequence number which increases with every
+    appended line, so clients can fetch exactly the lines they have not seen yet. The oldest lines are evicted once
+    either the line or the byte capacity is reached. Evicted lines can optionally be kept in compressed segments.
+    """
+
+    def __init__(
+            self,
+            max_lines: int = 100_000,
+            max_bytes: Optional[int] = None,
+            compress_evicted: bool = False,
+            max_segments: int = 64,
+            segment_lines: int = 4096,
+    ):
+        """
+        :param max_lines: Maximum number of lines in the ring buffer
+        :param max_bytes: Maximum size of the byte buffer, defaults to 128 bytes per line. The buffer grows up to
+        this size as lines are appended
+        :param compress_evicted: Keep evicted lines in compressed segments
+        :param max_segments: Maximum number of compressed segments, older segments are dropped
+        :param segment_lines: Number of lines per compressed segment
+        """
+        self.max_lines = max_lines
+        self.max_bytes = max_bytes or max_lines * 128
+        self.compress_evicted = compress_evicted
+        self.segment_lines = segment_lines
+
+        self._data = bytearray()
+        self._starts = array("L", bytes(array("L").itemsize * max_lines))
+        self._lengths = array("L", bytes(array("L").itemsize * max_lines))
+        self._first_seq = 0
+        self._next_seq = 0
+        self._write_pos = 0
+
+        # compressed segments of evicted lines: first seq, line lengths, compressed data
+        self._segments = deque(maxlen=max_segments)
+        self._pending: List[bytes] = []
+        self._pending_first_seq = 0
+        self._segment_cache: Optional[Tuple[int, List[bytes]]] = None
+
+    @property
+    def next_seq(self) -> int:
+        """
+        Sequence number the next appended line will get.
+        """
+        return self._next_seq
+
+    @property
+    def first_seq(self) -> int:
+        """
+        Sequence number of the oldest line still available.
+        """
+        if self._segments:
+            return self._segments[0][0]
+        if self._pending:
+            return self._pending_first_seq
+        return self._first_seq
+
+    def __len__(self):
+        return self._next_seq - self.first_seq
+
+    def append(self, line: str) -> int:
+        """
+        Append a line and return its sequence number.
+        """
+        data = line.encode("utf-8", "replace")[:self.max_bytes]
+        size = len(data)
+        pos = self._write_pos
+        if self._first_seq == self._next_seq:
+            pos = 0
+        elif pos + size > self.max_bytes:
+            # wrap around, the lines at the end of the buffer are the oldest ones
+            while self._first_seq < self._next_seq and self._starts[self._first_seq % self.max_lines] >= pos:
+                self._evict()
+            pos = 0
+        while self._first_seq < self._next_seq:
+            slot = self._first_seq % self.max_lines
+            start = self._starts[slot]
+            end = start + self._lengths[slot]
+            # an empty line at pos would end up behind the new line, so it is evicted like an overlapping one
+            overlaps = start < pos + size and (pos < end or start == pos)
+            if self._next_seq - self._first_seq >= self.max_lines or overlaps:
+                self._evict()
+                continue
+            break
+
+        # assigning past the end grows the buffer, pos never exceeds its current size
+        self._data[pos:pos + size] = data
+        slot = self._next_seq % self.max_lines
+        self._starts[slot] = pos
+        self._lengths[slot] = size
+        self._write_pos = pos + size
+        self._next_seq += 1
+        return self._next_seq - 1
+
+    def get(self, seq: int) -> str:
+        return self._get_bytes(seq).decode("utf-8", "replace")
+
+    def get_since(self, seq: int, limit: Optional[int] = None) -> Tuple[List[str], int]:
+        """
+        Get all lines with a sequence number greater or equal to seq.
+        :param seq: First sequence number to return, lines which are no longer available are skipped
+        :param limit: Maximum number of lines to return
+        :return: The lines and the sequence number to pass on the next call
+        """
+        start = max(seq, self.first_seq)
+        end = self._next_seq if limit is None else min(self._next_seq, start + limit)
+        return [self.get(i) for i in range(start, end)], end
+
+    def __getitem__(self, item: Union[int, slice]) -> Union[str, List[str]]:
+        """
+        Access lines by sequence number.
+        """
+        if isinstance(item, slice):
+            start, stop, step = item.indices(self._next_seq)
+            return [self.get(i) for i in range(max(start, self.first_seq), stop, step)]
+        if item < 0:
+            item += self._next_seq
+        return self.get(item)
+
+    def __iter__(self) -> Iterator[str]:
+        for seq in range(self.first_seq, self._next_seq):
+            yield self.get(seq)
+
+    def clear(self):
+        self._first_seq = self._next_seq
+        self._write_pos = 0
+        self._segments.clear()
+        self._pending = []
+        self._segment_cache = None
+
+    def _get_bytes(self, seq: int) -> bytes:
+        if self._first_seq <= seq < self._next_seq:
+            slot = seq % self.max_lines
+            start = self._starts[slot]
+            return bytes(self._data[start:start + self._lengths[slot]])
+        if self._pending and self._pending_first_seq <= seq < self._pending_first_seq + len(self._pending):
+            return self._pending[seq - self._pending_first_seq]
+        for first_seq, lengths, blob in self._segments:
+            if first_seq <= seq < first_seq + len(lengths):
+                return self._segment_lines(first_seq, lengths, blob)[seq - first_seq]
+        raise IndexError(f"Line {seq} is not available")
+
+    def _evict(self):
+        if self.compress_evicted:
+            slot = self._first_seq % self.max_lines
+            start = self._starts[slot]
+            if not self._pending:
+                self._pending_first_seq = self._first_seq
+            self._pending.append(bytes(self._data[start:start + self._lengths[slot]]))
+            if len(self._pending) >= self.segment_lines:
+                self._flush_pending()
+        self._first_seq += 1
+
+    def _flush_pending(self):
+        lengths = array("L", (len(line) for line in self._pending))
+        self._segments.append((self._pending_first_seq, lengths, _compress(b"".join(self._pending))))
+        self._pending = []
+
+    def _segment_lines(self, first_seq: int, lengths: array, blob: bytes) -> List[bytes]:
+        if self._segment_cache is not None and self._segment_cache[0] == first_seq:
+            return self._segment_cache[1]
+        data = _decompress(blob)
+        lines = []
+        pos = 0
+        for length in lengths:
+            lines.append(data[pos:pos + length])
+            pos += length
+        self._segment_cache = (first_seq, lines)
+        return lines
+
+
+def _compress(data: bytes) -> bytes:
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return zlib.compress(data, 6)
+
+
+def _decompress(data: bytes) -> bytes:
+    if zstandard is not None:
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
@@ -0,0 +1,203 @@
+import re
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Callable, Dict, Iterable, List, Optional, Pattern, Tuple
+
+from mc_server_interaction.interaction.server_process import Callback, OverflowPolicy
+
+
+class ServerEventType(Enum):
+    STARTED = 0
+    STOPPING = 1
+    SAVED = 2
+    STOPPED = 3
+    PLAYER_AUTHENTICATED = 4
+    PLAYER_JOINED = 5
+    PLAYER_LEFT = 6
+    CHAT = 7
+    DEATH = 8
+    ADVANCEMENT = 9
+    LAG = 10
+    TICK_STATS = 11
+
+
+@dataclass
+class LogLine:
+    raw: str
+    message: str
+    time: Optional[str] = None
+    thread: Optional[str] = None
+    level: Optional[str] = None
+
+
+@dataclass
+class ServerEvent:
+    type: ServerEventType
+    line: LogLine
+    data: Dict = field(default_factory=dict)
+
+
+# vanilla: [12:34:56] [Server thread/INFO]: message, bukkit: [12:34:56 INFO]: message,
+# forge: [12:34:56] [Server thread/INFO] [minecraft/DedicatedServer]: message, newer forge versions add a date
+_HEADER = re.compile(
+    r"\[(?:\d{2}[A-Za-z]{3}\d{4} )?(\d{2}:\d{2}:\d{2})(?:\.\d+)?(?:\] \[([^\]]*)/| )([A-Z]+)\](?: \[[^\]]*\])?: ?"
+)
+
+_PLAYER_NAME = re.compile(r"[A-Za-z0-9_]{1,16}")
+
+# death messages start with the player name followed by one of these words
+_DEATH_WORDS = {
+    "was", "drowned", "died", "fell", "blew", "burned", "went", "walked", "tried", "experienced", "hit", "starved",
+    "suffocated", "withered", "froze", "discovered", "didn't", "left", "hugged", "stung",
+}
+
+# literal message prefix, pattern, event type, names of the captured groups
+_MESSAGE_PATTERNS: List[Tuple[str, Pattern, ServerEventType, Tuple[str, ...]]] = [
+    ("Done (", re.compile(r'Done \(([\d.,]+)s\)! For help, type "help"'), ServerEventType.STARTED, ("startup_time",)),
+    ("Stopping the server", re.compile(r"Stopping the server"), ServerEventType.STOPPING, ()),
+    ("Saved the game", re.compile(r"Saved the game"), ServerEventType.SAVED, ()),
+    (
+        "ThreadedAnvilChunkStorage",
+        re.compile(r"ThreadedAnvilChunkStorage: All dimensions are saved"),
+        ServerEventType.STOPPED, ()
+    ),
+    (
+        "Can't keep up!",
+        re.compile(r"Can't keep up! Is the server overloaded\? Running (\d+)ms or (\d+) ticks behind"),
+        ServerEventType.LAG, ("behind_ms", "skipped_ticks")
+    ),
+    (
+        "UUID of player ",
+        re.compile(r"UUID of player (\w+) is ([0-9a-fA-F-]+)"),
+        ServerEventType.PLAYER_AUTHENTICATED, ("player", "uuid")
+    ),
+    (
+        "Average time per tick: ",
+        re.compile(r"Average time per tick: (\d+(?:[.,]\d+)?)ms"),
+        ServerEventType.TICK_STATS, ("mspt",)
+    ),
+    (
+        "Target tick rate: ",
+        re.compile(r"Target tick rate: (\d+(?:[.,]\d+)?) per second"),
+        ServerEventType.TICK_STATS, ("tick_rate",)
+    ),
+    (
+        "TPS from last ",
+        re.compile(r"TPS from last 1m, 5m, 15m: (?:\u00a7.)*\*?(\d+(?:[.,]\d+)?)"),
+        ServerEventType.TICK_STATS, ("tps",)
+    ),
+    # bukkit servers print the tps command in gold
+    (
+        "\u00a76TPS from last ",
+        re.compile(r"\u00a76TPS from last 1m, 5m, 15m: (?:\u00a7.)*\*?(\d+(?:[.,]\d+)?)"),
+        ServerEventType.TICK_STATS, ("tps",)
+    ),
+    ("<", re.compile(r"<(\w+)> (.*)", re.S), ServerEventType.CHAT, ("player", "message")),
+    ("[Not Secure] <", re.compile(r"\[Not Secure\] <(\w+)> (.*)", re.S), ServerEventType.CHAT, ("player", "message")),
+]
+
+
+def _to_float(value: str) -> float:
+    return float(value.replace(",", "."))
+
+
+_CONVERTERS: Dict[str, Callable] = {
+    "startup_time": _to_float,
+    "behind_ms": int,
+    "skipped_ticks": int,
+    "mspt": _to_float,
+    "tick_rate": _to_float,
+    "tps": _to_float,
+}
+
+
+def _event_data(names: Tuple[str, ...], values: Tuple[str, ...]) -> Dict:
+    return {name: _CONVERTERS.get(name, str)(value) for name, value in zip(names, values)}
+
+
+# patterns for messages starting with a player name, dispatched by the word following the name
+_PLAYER_PATTERNS: Dict[str, List[Tuple[Pattern, ServerEventType, Tuple[str, ...]]]] = {
+    "joined": [(re.compile(r"joined the game$"), ServerEventType.PLAYER_JOINED, ())],
+    "left": [(re.compile(r"left the game$"), ServerEventType.PLAYER_LEFT, ())],
+    "has": [(
+        re.compile(r"has (made the advancement|completed the challenge|reached the goal) \[(.+)\]$"),
+        ServerEventType.ADVANCEMENT, ("kind", "advancement")
+    )],
+}
+
+
+class LogEventParser:
+    """
+    Parses every output line once into its timestamp, thread, level and message and classifies the message.
+    Messages are matched against a table of compiled patterns which is indexed by the first character of the
+    literal message prefix, so most lines are only checked against one or two patterns.
+    """
+
+    def __init__(self):
+        self._prefix_table: Dict[str, List[Tuple[str, Pattern, ServerEventType, Tuple[str, ...]]]] = {}
+        for entry in _MESSAGE_PATTERNS:
+            self._prefix_table.setdefault(entry[0][0], []).append(entry)
+
+    def parse(self, raw: str) -> Tuple[LogLine, Optional[ServerEvent]]:
+        header = _HEADER.match(raw)
+        if header is None:
+            line = LogLine(raw, raw)
+        else:
+            line = LogLine(raw, raw[header.end():], header.group(1), header.group(2), header.group(3))
+        return line, self.classify(line)
+
+    def classify(self, line: LogLine) -> Optional[ServerEvent]:
+        message = line.message
+        if not message:
+            return None
+        for prefix, pattern, event_type, names in self._prefix_table.get(message[0], ()):
+            if message.startswith(prefix):
+                match = pattern.match(message)
+                if match is not None:
+                    return ServerEvent(event_type, line, _event_data(names, match.groups()))
+        return self._classify_player_message(line)
+
+    @staticmethod
+    def _classify_player_message(line: LogLine) -> Optional[ServerEvent]:
+        name, _, rest = line.message.partition(" ")
+        if not rest or not _PLAYER_NAME.fullmatch(name):
+            return None
+        word = rest.split(" ", 1)[0]
+        for pattern, event_type, names in _PLAYER_PATTERNS.get(word, ()):
+            match = pattern.match(rest)
+            if match is not None:
+                data = _event_data(names, match.groups())
+                data["player"] = name
+                return ServerEvent(event_type, line, data)
+        if word in _DEATH_WORDS and line.thread in ("Server thread", None):
+            return ServerEvent(ServerEventType.DEATH, line, {"player": name, "message": rest})
+        return None
+
+
+class EventCallback(Callback):
+    """
+    Callback for server events. Functions can be restricted to a set of event types.
+    """
+
+    def add_callback(
+            self,
+            func: Callable,
+            event_types: Optional[Iterable[ServerEventType]] = None,
+            maxsize: Optional[int] = None,
+            overflow: Optional[OverflowPolicy] = None,
+    ):
+        """
+        :param func: Function or coroutine function called with the ServerEvent
+        :param event_types: Only call func for these event types, all events if None
+        :param maxsize: Size of the queue of this function
+        :param overflow: Policy when the queue is full
+        """
+        accepts = None
+        if event_types is not None:
+            event_types = frozenset(event_types)
+
+            def _accepts(event: ServerEvent) -> bool:
+                return event.type in event_types
+
+            accepts = _accepts
+        super().add_callback(func, maxsize, overflow, accepts)
@@ -0,0 +1,323 @@
+import bisect
+import json
+import logging
+import math
+import os
+import struct
+import sys
+import time
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+_NAN = float("nan")
+_MAGIC = b"MCMS"
+_HEADER_SIZE = struct.Struct("<I")
+
+
+class Metric:
+    CPU = "cpu"
+    MEMORY = "memory"
+    SYSTEM_MEMORY = "system_memory"
+    PLAYERS = "players"
+    TPS = "tps"
+    MSPT = "mspt"
+
+    ALL = (CPU, MEMORY, SYSTEM_MEMORY, PLAYERS, TPS, MSPT)
+
+
+class Resolution:
+    SECOND = 1
+    MINUTE = 60
+    HOUR = 3600
+
+
+class Histogram:
+    """
+    Counts of values in fixed buckets. Percentiles are the upper bound of the bucket they fall into, values above
+    the last bound are reported as the maximum.
+    """
+
+    def __init__(self, bounds: Sequence[float]):
+        """
+        :param bounds: Ascending upper bounds of the buckets
+        """
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max: Optional[float] = None
+
+    def add(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def percentile(self, percent: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = percent / 100 * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                return min(self.bounds[i], self.max) if i < len(self.bounds) else self.max
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "avg": self.sum / self.count if self.count else None,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            # upper bound, None for the last bucket, and count of every bucket
+            "buckets": [[bound, count] for bound, count in zip(self.bounds + [None], self.counts)],
+        }
+
+
+class _Ring:
+    """
+    Fixed size ring of rows with a timestamp and a number of float columns.
+    """
+
+    def __init__(self, interval: int, size: int, columns: int):
+        self.interval = interval
+        self.size = size
+        self.timestamps = array("d", [_NAN]) * size
+        self.columns = [array("d", [_NAN]) * size for _ in range(columns)]
+        self.pos = 0
+        self.count = 0
+
+    def append(self, timestamp: float, values: Sequence[float]):
+        self.timestamps[self.pos] = timestamp
+        for column, value in zip(self.columns, values):
+            column[self.pos] = value
+        self.pos = (self.pos + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    @property
+    def first_timestamp(self) -> Optional[float]:
+        return self.timestamps[self._slot(0)] if self.count else None
+
+    @property
+    def last_timestamp(self) -> Optional[float]:
+        return self.timestamps[self._slot(self.count - 1)] if self.count else None
+
+    def slots(self, start: float, end: float) -> Iterable[int]:
+        """
+        :return: The slots of all rows with start <= timestamp <= end in chronological order
+        """
+        # binary search, the timestamps increase in logical order
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.timestamps[self._slot(middle)] < start:
+                low = middle + 1
+            else:
+                high = middle
+        for i in range(low, self.count):
+            slot = self._slot(i)
+            if self.timestamps[slot] > end:
+                break
+            yield slot
+
+    def latest(self, column: int) -> Optional[float]:
+        return self.columns[column][self._slot(self.count - 1)] if self.count else None
+
+    def _slot(self, index: int) -> int:
+        return (self.pos - self.count + index) % self.size
+
+    def arrays(self) -> List[array]:
+        return [self.timestamps] + self.columns
+
+
+class _Bucket:
+    """
+    Min, sum, max and count of every metric within one rollup interval.
+    """
+
+    def __init__(self, start: float, metrics: int):
+        self.start = start
+        self.minimum = [math.inf] * metrics
+        self.maximum = [-math.inf] * metrics
+        self.sum = [0.0] * metrics
+        self.count = [0] * metrics
+
+    def add(self, values: Sequence[float]):
+        for i, value in enumerate(values):
+            if value != value:
+                # nan, the metric was not available
+                continue
+            if value < self.minimum[i]:
+                self.minimum[i] = value
+            if value > self.maximum[i]:
+                self.maximum[i] = value
+            self.sum[i] += value
+            self.count[i] += 1
+
+    def row(self) -> List[float]:
+        row = []
+        for i, count in enumerate(self.count):
+            if count:
+                row += [self.minimum[i], self.sum[i] / count, self.maximum[i]]
+            else:
+                row += [_NAN, _NAN, _NAN]
+        return row
+
+
+class MetricsStore:
+    """
+    History of server metrics in preallocated ring buffers: raw samples at 1 second resolution and
+    min/avg/max rollups per minute and per hour. With the default sizes this covers one hour of raw samples,
+    one day of minutes and 30 days of hours in about 80 KiB per metric.
+    """
+
+    def __init__(
+            self,
+            metrics: Sequence[str] = Metric.ALL,
+            raw_size: int = 3600,
+            minute_size: int = 1440,
+            hour_size: int = 720,
+    ):
+        """
+        :param metrics: Names of the recorded metrics
+        :param raw_size: Number of raw samples to keep
+        :param minute_size: Number of minute rollups to keep
+        :param hour_size: Number of hour rollups to keep
+        """
+        self.logger = logging.getLogger(f"MCServerInteraction.{self.__class__.__name__}")
+        self.metrics = list(metrics)
+        self._index = {metric: i for i, metric in enumerate(self.metrics)}
+        self._raw = _Ring(Resolution.SECOND, raw_size, len(self.metrics))
+        self._rollups = {
+            Resolution.MINUTE: _Ring(Resolution.MINUTE, minute_size, 3 * len(self.metrics)),
+            Resolution.HOUR: _Ring(Resolution.HOUR, hour_size, 3 * len(self.metrics)),
+        }
+        self._buckets: Dict[int, Optional[_Bucket]] = {interval: None for interval in self._rollups}
+
+    def record(self, values: Dict[str, float], timestamp: Optional[float] = None):
+        """
+        Record a sample. Missing metrics are stored as nan and ignored by the rollups.
+        :param values: Dictionary of metric: value
+        :param timestamp: Unix time of the sample, now if None. Samples older than the last one are dropped.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        last_timestamp = self._raw.last_timestamp
+        if last_timestamp is not None and timestamp <= last_timestamp:
+            return
+        row = [float(values.get(metric, _NAN)) for metric in self.metrics]
+        self._raw.append(timestamp, row)
+        for interval, ring in self._rollups.items():
+            start = timestamp - timestamp % interval
+            bucket = self._buckets[interval]
+            if bucket is not None and bucket.start != start:
+                ring.append(bucket.start, bucket.row())
+                bucket = None
+            if bucket is None:
+                bucket = self._buckets[interval] = _Bucket(start, len(self.metrics))
+            bucket.add(row)
+
+    def latest(self, metric: str) -> Optional[float]:
+        value = self._raw.latest(self._index[metric])
+        return None if value is None or value != value else value
+
+    def query(
+            self,
+            metric: str,
+            start: float,
+            end: Optional[float] = None,
+            resolution: Optional[int] = None,
+    ) -> List[Tuple[float, float, float, float]]:
+        """
+        Get the history of a metric.
+        :param metric: Name of the metric
+        :param start: Unix time of the first sample
+        :param end: Unix time of the last sample, now if None
+        :param resolution: One of Resolution, the finest resolution which still covers start if None
+        :return: List of (timestamp, min, avg, max), all three values are the same for raw samples
+        """
+        end = time.time() if end is None else end
+        if resolution is None:
+            resolution = self._resolution_for(start)
+        column = self._index[metric]
+        result = []
+        if resolution == Resolution.SECOND:
+            values = self._raw.columns[column]
+            for slot in self._raw.slots(start, end):
+                value = values[slot]
+                if value == value:
+                    result.append((self._raw.timestamps[slot], value, value, value))
+            return result
+        ring = self._rollups[resolution]
+        minimum, average, maximum = ring.columns[3 * column:3 * column + 3]
+        for slot in ring.slots(start, end):
+            if average[slot] == average[slot]:
+                result.append((ring.timestamps[slot], minimum[slot], average[slot], maximum[slot]))
+        return result
+
+    def _resolution_for(self, start: float) -> int:
+        for resolution, ring in ((Resolution.SECOND, self._raw), *self._rollups.items()):
+            if ring.first_timestamp is not None and ring.first_timestamp <= start:
+                return resolution
+        return Resolution.HOUR if self._rollups[Resolution.HOUR].count else Resolution.SECOND
+
+    def _rings(self) -> List[_Ring]:
+        return [self._raw, *self._rollups.values()]
+
+    def save(self, path: str):
+        """
+        Write the history to a compact binary file. The unfinished rollup intervals are not saved.
+        """
+        header = json.dumps({
+            "metrics": self.metrics,
+            "byteorder": sys.byteorder,
+            "rings": [{"interval": ring.interval, "size": ring.size, "pos": ring.pos, "count": ring.count}
+                      for ring in self._rings()],
+        }).encode("utf-8")
+        temp_path = f"{path}.part"
+        with open(temp_path, "wb") as f:
+            f.write(_MAGIC)
+            f.write(_HEADER_SIZE.pack(len(header)))
+            f.write(header)
+            for ring in self._rings():
+                for data in ring.arrays():
+                    data.tofile(f)
+        os.replace(temp_path, path)
+
+    def load(self, path: str) -> bool:
+        """
+        Load the history written by save. Files with other metrics or ring sizes are ignored.
+        :return: True if the history was loaded
+        """
+        try:
+            with open(path, "rb") as f:
+                if f.read(len(_MAGIC)) != _MAGIC:
+                    raise ValueError("not a metrics file")
+                header = json.loads(f.read(_HEADER_SIZE.unpack(f.read(_HEADER_SIZE.size))[0]))
+                rings = self._rings()
+                if header["metrics"] != self.metrics or [
+                    (ring["interval"], ring["size"]) for ring in header["rings"]
+                ] != [(ring.interval, ring.size) for ring in rings]:
+                    raise ValueError("metrics or sizes differ")
+                loaded = []
+                for ring in rings:
+                    arrays = []
+                    for _ in ring.arrays():
+                        data = array("d")
+                        data.fromfile(f, ring.size)
+                        if header["byteorder"] != sys.byteorder:
+                            data.byteswap()
+                        arrays.append(data)
+                    loaded.append(arrays)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError, KeyError, EOFError, struct.error) as e:
+            self.logger.warning(f"Could not load metrics history from {path}: {e}")
+            return False
+        for ring, arrays, ring_header in zip(rings, loaded, header["rings"]):
+            ring.timestamps, ring.columns = arrays[0], arrays[1:]
+            ring.pos, ring.count = ring_header["pos"], ring_header["count"]
+        return True
@@ -1,7 +1,7 @@
 import time
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
-from typing import Optional, Union
+from typing import List, Optional, Union
 
 
 class ServerStatus(Enum):
@@ -33,6 +33,17 @@ class OPPlayer(Player):
     op_level: Optional[int] = 4
 
 
+class LaunchProfile:
+    # only heap size flags
+    DEFAULT = "default"
+    # G1 tuned for Minecraft after Aikar's flags
+    AIKAR = "aikar"
+    # generational ZGC, Java 21+, short pauses for large heaps
+    ZGC = "zgc"
+
+    ALL = (DEFAULT, AIKAR, ZGC)
+
+
 @dataclass
 class ServerConfig:
     path: str
@@ -41,6 +52,17 @@ class ServerConfig:
     ram: int = 2048
     created_at: float = time.time()
     installed: bool = True
+    log_lines: int = 100_000
+    persist_metrics: bool = False
+    # console commands per second and how many can be sent at once, the server runs all commands of a tick at once
+    command_rate: float = 200
+    command_burst: int = 50
+    java_path: str = "java"
+    launch_profile: str = LaunchProfile.DEFAULT
+    # appended after the flags of the launch profile, so they can override them
+    extra_jvm_args: List[str] = field(default_factory=list)
+    # share loaded classes between starts with an AppCDS archive, needs Java 13+
+    use_cds: bool = False
 
     def set_ram(self, ram: Union[int, str]):
         if isinstance(ram, str):
@@ -0,0 +1,140 @@
+import copy
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from mc_server_interaction.interaction.models import BannedPlayer, OPPlayer, Player
+from mc_server_interaction.utils.file_cache import read_json
+
+
+class PlayerChange:
+    JOINED = "joined"
+    LEFT = "left"
+    OPPED = "opped"
+    DEOPPED = "deopped"
+    BANNED = "banned"
+    UNBANNED = "unbanned"
+
+
+@dataclass
+class PlayerDelta:
+    change: str
+    player: Player
+
+
+class PlayerRegistry:
+    """
+    Indexed state of the players of a server, updated incrementally from join and leave events and from changes of
+    the ops and ban lists. Every update returns the resulting changes as PlayerDelta list.
+    """
+
+    def __init__(self):
+        self.online: Dict[str, Player] = {}
+        self.ops: Dict[str, OPPlayer] = {}
+        self.banned: Dict[str, BannedPlayer] = {}
+        self.uuids: Dict[str, str] = {}
+        self.names: Dict[str, str] = {}
+
+    def authenticated(self, name: str, uuid: str):
+        self.uuids[name] = uuid
+        self.names[uuid] = name
+
+    def get_uuid(self, name: str) -> Optional[str]:
+        return self.uuids.get(name)
+
+    def get_name(self, uuid: str) -> Optional[str]:
+        return self.names.get(uuid)
+
+    def join(self, name: str) -> List[PlayerDelta]:
+        if name in self.online:
+            return []
+        self.online[name] = Player(name, is_online=True)
+        return [self._delta(PlayerChange.JOINED, name)]
+
+    def leave(self, name: str) -> List[PlayerDelta]:
+        if name not in self.online:
+            return []
+        delta = self._delta(PlayerChange.LEFT, name)
+        del self.online[name]
+        delta.player.is_online = False
+        return [delta]
+
+    def set_online(self, names: Iterable[str]) -> List[PlayerDelta]:
+        """
+        Replace the online players, for example with the complete list of a query.
+        """
+        names = set(names)
+        deltas = []
+        for name in [name for name in self.online if name not in names]:
+            deltas += self.leave(name)
+        for name in names:
+            deltas += self.join(name)
+        return deltas
+
+    def set_ops(self, ops: Iterable[OPPlayer]) -> List[PlayerDelta]:
+        ops = {player.name: player for player in ops}
+        deltas = [self._delta(PlayerChange.DEOPPED, name) for name in self.ops if name not in ops]
+        for delta in deltas:
+            delta.player.is_op = False
+        added = [name for name in ops if name not in self.ops]
+        self.ops = ops
+        return deltas + [self._delta(PlayerChange.OPPED, name) for name in added]
+
+    def set_banned(self, banned: Iterable[BannedPlayer]) -> List[PlayerDelta]:
+        banned = {player.name: player for player in banned}
+        deltas = [self._delta(PlayerChange.UNBANNED, name) for name in self.banned if name not in banned]
+        for delta in deltas:
+            delta.player.is_banned = False
+        added = [name for name in banned if name not in self.banned]
+        self.banned = banned
+        return deltas + [self._delta(PlayerChange.BANNED, name) for name in added]
+
+    def get_player(self, name: str) -> Player:
+        """
+        :return: A copy of the player with all flags set
+        """
+        player = copy.copy(self.banned.get(name) or self.ops.get(name) or self.online.get(name) or Player(name))
+        player.is_online = name in self.online
+        player.is_op = name in self.ops
+        player.is_banned = name in self.banned
+        return player
+
+    def snapshot(self) -> Dict[str, List[Player]]:
+        """
+        :return: Copies of all online, op and banned players. Banned players are not listed as ops.
+        """
+        return {
+            "online_players": [self.get_player(name) for name in self.online],
+            "op_players": [self.get_player(name) for name in self.ops if name not in self.banned],
+            "banned_players": [self.get_player(name) for name in self.banned],
+        }
+
+    def _delta(self, change: str, name: str) -> PlayerDelta:
+        return PlayerDelta(change, self.get_player(name))
+
+
+def parse_banned_players(path: str) -> List[BannedPlayer]:
+    banned_players = []
+    for player_data in read_json(path):
+        timestamp = datetime.strptime(player_data["created"].split(" +")[0], "%Y-%m-%d %H:%M:%S").timestamp()
+        player = BannedPlayer(player_data["name"])
+        player.is_banned = True
+        player.banned_since = timestamp
+        player.banned_by = player_data.get("source", "")
+        player.reason = player_data["reason"]
+        banned_players.append(player)
+    return banned_players
+
+
+def parse_op_players(path: str) -> List[OPPlayer]:
+    op_players = []
+    for player_data in read_json(path):
+        player = OPPlayer(player_data["name"])
+        player.is_op = True
+        player.op_level = player_data["level"]
+        op_players.append(player)
+    return op_players
+
+
+def parse_whitelisted_players(path: str) -> List[Player]:
+    return [Player(player_data["name"]) for player_data in read_json(path)]
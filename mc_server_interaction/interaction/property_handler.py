@@ -2,6 +2,30 @@ import logging
 import os
 from typing import Optional
 
+from mc_server_interaction.utils.file_cache import file_cache
+
+
+def parse_properties(file_name: str) -> dict:
+    data = {}
+    with open(file_name, "r", encoding="utf-8") as f:
+        for i in f:
+            if i.startswith("#"):
+                continue
+
+            key, raw_value = i.split("=")
+            raw_value = raw_value.rstrip("\n")
+
+            if raw_value in ["true", "false"]:
+                value = raw_value == "true"
+            else:
+                try:
+                    value = int(raw_value)
+                except ValueError:
+                    value = raw_value
+
+            data[key] = value
+    return data
+
 
 class ServerProperties:
     logger: logging.Logger
@@ -16,24 +40,9 @@ class ServerProperties:
         if not os.path.exists(file_name):
             self.logger.warning("Properties file not found, creating empty instance")
             return
-        with open(file_name, "r", encoding="utf-8") as f:
-            for i in f:
-                if i.startswith("#"):
-                    continue
-
-                key, raw_value = i.split("=")
-                raw_value = raw_value.rstrip("\n")
-
-                if raw_value in ["true", "false"]:
-                    value = raw_value == "true"
-                else:
-                    try:
-                        value = int(raw_value)
-                    except ValueError:
-                        value = raw_value
-
-                self.__data[key] = value
-            self.logger.debug(f"Loaded {len(self.__data)} entries from properties file")
+        # copy, the parsed file is shared through the file cache
+        self.__data = dict(file_cache.get(file_name, parse_properties))
+        self.logger.debug(f"Loaded {len(self.__data)} entries from properties file")
 
     def set(self, key, value):
         self.__data[key] = value
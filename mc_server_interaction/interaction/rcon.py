@@ -0,0 +1,222 @@
+import asyncio
+import itertools
+import logging
+import struct
+import time
+from typing import List, Optional, Set, Tuple
+
+from mc_server_interaction.exceptions import RconException
+
+_HEADER = struct.Struct("<iii")
+_LENGTH = struct.Struct("<i")
+
+_TYPE_RESPONSE = 0
+_TYPE_COMMAND = 2
+_TYPE_LOGIN = 3
+# the server answers requests of unknown type with a single response packet, which marks the end of the
+# possibly multi-packet response of the command sent before it
+_TYPE_MARKER = 200
+
+# the server reads requests into a buffer of 1460 bytes including the packet header
+MAX_COMMAND_LENGTH = 1446
+
+
+class _RconConnection:
+    """
+    One authenticated connection. The vanilla server reads a request with a single read of the socket and drops the
+    connection if it got more or less than one packet, so only one packet is in flight at a time.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    @property
+    def is_connected(self) -> bool:
+        # at_eof notices a connection the server closed while it was idle
+        return not self.writer.is_closing() and not self.reader.at_eof()
+
+    async def login(self, login_id: int, password: str) -> bool:
+        await self._send(login_id, _TYPE_LOGIN, password.encode("utf-8"))
+        response_id, _, _ = await self._read_packet()
+        return response_id == login_id
+
+    async def command(self, request_id: int, marker_id: int, data: bytes) -> str:
+        """
+        Send a command and collect its possibly multi-packet response. The marker is only sent after the first
+        packet of the response arrived, the server answers it after the remaining packets of the command.
+        """
+        await self._send(request_id, _TYPE_COMMAND, data)
+        parts = []
+        marker_sent = False
+        while True:
+            response_id, _, body = await self._read_packet()
+            if response_id == request_id:
+                parts.append(body)
+                if not marker_sent:
+                    await self._send(marker_id, _TYPE_MARKER, b"")
+                    marker_sent = True
+            elif response_id == marker_id and marker_sent:
+                return "".join(parts)
+
+    async def close(self):
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except (OSError, ConnectionError):
+            pass
+
+    async def _send(self, request_id: int, packet_type: int, body: bytes):
+        self.writer.write(_packet(request_id, packet_type, body))
+        await self.writer.drain()
+
+    async def _read_packet(self) -> Tuple[int, int, str]:
+        length = _LENGTH.unpack(await self.reader.readexactly(_LENGTH.size))[0]
+        data = await self.reader.readexactly(length)
+        request_id, packet_type = struct.unpack_from("<ii", data)
+        # the body is followed by two null bytes
+        return request_id, packet_type, data[8:-2].decode("utf-8", "replace")
+
+
+class RconClient:
+    """
+    Asyncio RCON client keeping a small pool of persistent connections to a server.
+
+    Every connection has one command in flight at a time. The end of a response is detected with a marker request,
+    which is sent once the first response packet arrived. Commands run concurrently on up to pool_size connections.
+    Connections are established on first use and re-established after they were lost.
+    """
+
+    def __init__(
+            self,
+            server_name: str,
+            password: str,
+            host: str = "localhost",
+            port: int = 25575,
+            timeout: float = 10,
+            max_reconnect_delay: float = 30,
+            pool_size: int = 2,
+    ):
+        """
+        :param server_name: Name of the server used for logging
+        :param password: The rcon.password of the server
+        :param host: Host of the server
+        :param port: The rcon.port of the server
+        :param timeout: Default timeout in seconds for connecting and for every command
+        :param max_reconnect_delay: Maximum delay in seconds between failed connection attempts
+        :param pool_size: Maximum number of connections, the number of commands which run at the same time
+        """
+        self.logger = logging.getLogger(f"MCServerInteraction.{self.__class__.__name__}:{server_name}")
+        self.host = host
+        self.port = port
+        self.password = password
+        self.timeout = timeout
+        self.max_reconnect_delay = max_reconnect_delay
+        self.pool_size = max(1, pool_size)
+
+        self._slots = asyncio.Semaphore(self.pool_size)
+        self._idle: List[_RconConnection] = []
+        self._busy: Set[_RconConnection] = set()
+        self._connect_lock = asyncio.Lock()
+        self._ids = itertools.count(1)
+        self._failures = 0
+        self._retry_at = 0.0
+
+    @property
+    def is_connected(self) -> bool:
+        return any(connection.is_connected for connection in self._idle + list(self._busy))
+
+    async def command(self, command: str, timeout: Optional[float] = None) -> str:
+        """
+        Run a command and return its output.
+        :param command: The command without leading slash
+        :param timeout: Timeout in seconds, the default timeout of the client if None
+        :return: The output of the command
+        """
+        data = command.encode("utf-8")
+        if len(data) > MAX_COMMAND_LENGTH:
+            raise RconException(f"Command is longer than {MAX_COMMAND_LENGTH} bytes")
+        async with self._slots:
+            connection = await self._acquire()
+            self._busy.add(connection)
+            try:
+                output = await asyncio.wait_for(
+                    connection.command(self._next_id(), self._next_id(), data), timeout or self.timeout
+                )
+            except asyncio.TimeoutError:
+                # a late response would be taken for the response of the next command
+                await connection.close()
+                raise RconException(f"Command timed out: {command}")
+            except (OSError, asyncio.IncompleteReadError) as e:
+                self.logger.warning(f"RCON connection lost: {e!r}")
+                await connection.close()
+                raise RconException(f"Connection lost: {e!r}")
+            except BaseException:
+                await connection.close()
+                raise
+            finally:
+                self._busy.discard(connection)
+            self._idle.append(connection)
+            return output
+
+    async def connect(self):
+        """
+        Make sure an idle connection is available.
+        """
+        async with self._slots:
+            self._idle.append(await self._acquire())
+
+    async def _acquire(self) -> _RconConnection:
+        while self._idle:
+            connection = self._idle.pop()
+            if connection.is_connected:
+                return connection
+            await connection.close()
+        async with self._connect_lock:
+            delay = self._retry_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                connection = await asyncio.wait_for(self._connect(), self.timeout)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+                self._failures += 1
+                self._retry_at = time.monotonic() + min(self.max_reconnect_delay, 2 ** (self._failures - 1))
+                raise RconException(f"Could not connect to {self.host}:{self.port}: {e!r}")
+            self._failures = 0
+            self._retry_at = 0.0
+            return connection
+
+    async def _connect(self) -> _RconConnection:
+        self.logger.debug(f"Connecting to {self.host}:{self.port}")
+        connection = _RconConnection(*await asyncio.open_connection(self.host, self.port))
+        try:
+            authenticated = await connection.login(self._next_id(), self.password)
+        except BaseException:
+            await connection.close()
+            raise
+        if not authenticated:
+            await connection.close()
+            # not retried, a wrong password does not fix itself
+            raise RconException("Authentication failed")
+        return connection
+
+    async def close(self):
+        """
+        Close all connections, commands which are still running fail.
+        """
+        connections = self._idle + list(self._busy)
+        self._idle = []
+        for connection in connections:
+            await connection.close()
+
+    def _next_id(self) -> int:
+        # request ids are signed 32 bit integers and -1 signals a failed login
+        request_id = next(self._ids)
+        if request_id >= 2 ** 31 - 1:
+            self._ids = itertools.count(1)
+            request_id = next(self._ids)
+        return request_id
+
+
+def _packet(request_id: int, packet_type: int, body: bytes) -> bytes:
+    return _HEADER.pack(len(body) + 10, request_id, packet_type) + body + b"\0\0"
@@ -0,0 +1,222 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import psutil
+
+from mc_server_interaction.utils.scheduler import Job, Scheduler, default_scheduler
+
+
+class MemoryMode:
+    # resident set size from /proc/<pid>/statm, cheapest, counts shared pages fully in every process
+    RSS = "rss"
+    # proportional set size from /proc/<pid>/smaps_rollup (Linux 4.14+), falls back to RSS elsewhere.
+    # The kernel still walks every mapping, so this costs about ten times as much as RSS for a JVM
+    PSS = "pss"
+    # unique set size from psutil's memory_full_info, which reads the full /proc/<pid>/smaps on older psutil
+    # versions and kernels. Slowest, especially for the many mappings of large JVM heaps
+    USS = "uss"
+
+
+class ResourceSampler:
+    """
+    Samples the resource usage of server processes. System wide stats are read once per pass and every process,
+    including its child processes, is read inside psutil's oneshot context.
+    While processes are added, a single job on the scheduler samples every interval all processes which were read
+    since the previous pass, so the metric jobs of all servers share one pass instead of each sampling on its own
+    tick. Processes which are read less often, like idle servers, are sampled on their own when read.
+    """
+
+    def __init__(
+            self,
+            memory_mode: str = MemoryMode.PSS,
+            include_children: bool = True,
+            interval: float = 1,
+            max_age: float = 1.5,
+            scheduler: Optional[Scheduler] = None,
+    ):
+        """
+        :param memory_mode: One of MemoryMode, how the memory of the server processes is measured
+        :param include_children: Add the usage of child processes to their server process
+        :param interval: Seconds between the shared passes
+        :param max_age: Seconds a sample is returned by get before the process is sampled again
+        :param scheduler: Scheduler running the shared passes, the default scheduler if None
+        """
+        self.logger = logging.getLogger(f"MCServerInteraction.{self.__class__.__name__}")
+        self.memory_mode = memory_mode
+        self.include_children = include_children
+        self.interval = interval
+        self.max_age = max_age
+        self.scheduler = scheduler or default_scheduler
+        self.num_cpus = psutil.cpu_count() or 1
+        self._pids: Dict[int, psutil.Process] = {}
+        # processes are kept between passes, cpu_percent measures the time since the previous call
+        self._children: Dict[int, Dict[int, psutil.Process]] = {}
+        self._samples: Dict[int, dict] = {}
+        self._sampled_at: Dict[int, float] = {}
+        self._requested: Dict[int, float] = {}
+        self._passed_at = 0.0
+        self._job: Optional[Job] = None
+        self._smaps_rollup = True
+
+    def add(self, pid: int):
+        if pid in self._pids:
+            return
+        self._pids[pid] = psutil.Process(pid)
+        if self._job is None:
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                # no running event loop, processes are sampled when read
+                return
+            self._job = self.scheduler.add_job(self._run, self.interval, self.interval, "ResourceSampler")
+
+    def remove(self, pid: int):
+        self._pids.pop(pid, None)
+        self._children.pop(pid, None)
+        self._samples.pop(pid, None)
+        self._sampled_at.pop(pid, None)
+        self._requested.pop(pid, None)
+        if not self._pids and self._job is not None:
+            self.scheduler.remove_job(self._job)
+            self._job = None
+
+    def get(self, pid: int) -> dict:
+        """
+        :return: Resource usage of the process and of the system, in the format of ServerProcess.get_resource_usage
+        """
+        try:
+            self.add(pid)
+        except psutil.NoSuchProcess:
+            return _idle_usage()
+        now = time.monotonic()
+        self._requested[pid] = now
+        sampled_at = self._sampled_at.get(pid)
+        if sampled_at is None or now - sampled_at > self.max_age:
+            self.sample([pid])
+        return self._samples.get(pid) or _idle_usage()
+
+    async def _run(self):
+        pids = [pid for pid, requested in self._requested.items() if requested >= self._passed_at]
+        self._passed_at = time.monotonic()
+        if pids:
+            self.sample(pids)
+
+    def sample(self, pids: Optional[Iterable[int]] = None) -> Dict[int, dict]:
+        """
+        Sample added processes now.
+        :param pids: The processes to sample, all added processes if None
+        :return: Dictionary of pid: resource usage
+        """
+        memory_system = psutil.virtual_memory()
+        child_map = self._child_map() if self.include_children else {}
+        samples = {}
+        for pid in list(self._pids) if pids is None else pids:
+            process = self._pids.get(pid)
+            if process is None:
+                continue
+            try:
+                cpu, memory = self._sample_process(process)
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                self.remove(pid)
+                continue
+            previous_children = self._children.get(pid, {})
+            children = {}
+            for child_pid in _descendants(pid, child_map):
+                try:
+                    child = previous_children.get(child_pid) or psutil.Process(child_pid)
+                    child_cpu, child_memory = self._sample_process(child)
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    continue
+                children[child_pid] = child
+                cpu += child_cpu
+                memory += child_memory
+            self._children[pid] = children
+            samples[pid] = {
+                "cpu": {
+                    "percent": round(cpu / self.num_cpus, 2)
+                },
+                "memory": {
+                    "total": memory_system.total,
+                    "used": memory_system.used,
+                    "server": memory,
+                },
+            }
+        now = time.monotonic()
+        self._samples.update(samples)
+        self._sampled_at.update((pid, now) for pid in samples)
+        return samples
+
+    def _sample_process(self, process: psutil.Process) -> Tuple[float, int]:
+        with process.oneshot():
+            cpu = process.cpu_percent()
+            if self.memory_mode == MemoryMode.USS:
+                memory = process.memory_full_info().uss
+            elif self.memory_mode == MemoryMode.PSS:
+                memory = self._read_pss(process)
+            else:
+                memory = process.memory_info().rss
+        return cpu, memory
+
+    @staticmethod
+    def _child_map() -> Dict[int, List[int]]:
+        """
+        Map of pid: child pids of all processes, built once per pass instead of scanning all processes for the
+        children of every server.
+        """
+        child_map: Dict[int, List[int]] = {}
+        if os.path.isdir("/proc"):
+            for entry in os.scandir("/proc"):
+                if not entry.name.isdigit():
+                    continue
+                try:
+                    with open(f"/proc/{entry.name}/stat", "rb") as f:
+                        stat = f.read()
+                except OSError:
+                    continue
+                # the process name in parentheses can contain spaces, the ppid is the second field after it
+                ppid = int(stat[stat.rfind(b")") + 2:].split(maxsplit=2)[1])
+                child_map.setdefault(ppid, []).append(int(entry.name))
+        else:
+            for process in psutil.process_iter(["ppid"]):
+                child_map.setdefault(process.info["ppid"], []).append(process.pid)
+        return child_map
+
+    def _read_pss(self, process: psutil.Process) -> int:
+        if self._smaps_rollup:
+            try:
+                with open(f"/proc/{process.pid}/smaps_rollup", "rb") as f:
+                    for line in f:
+                        if line.startswith(b"Pss:"):
+                            return int(line.split()[1]) * 1024
+            except FileNotFoundError:
+                if psutil.pid_exists(process.pid):
+                    self.logger.debug("smaps_rollup is not available, measuring RSS instead of PSS")
+                    self._smaps_rollup = False
+                else:
+                    raise psutil.NoSuchProcess(process.pid)
+            except PermissionError:
+                raise psutil.AccessDenied(process.pid)
+        return process.memory_info().rss
+
+
+def _descendants(pid: int, child_map: Dict[int, List[int]]) -> List[int]:
+    descendants = []
+    pending = list(child_map.get(pid, ()))
+    while pending:
+        child = pending.pop()
+        descendants.append(child)
+        pending.extend(child_map.get(child, ()))
+    return descendants
+
+
+def _idle_usage() -> dict:
+    return {
+        "cpu": {"percent": 0},
+        "memory": {"total": 0, "used": 0, "server": 0},
+    }
+
+
+default_sampler = ResourceSampler()
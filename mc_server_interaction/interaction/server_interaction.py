@@ -1,18 +1,16 @@
 import asyncio
+import copy
 import dataclasses
-import json
 import logging
 import os
-from collections import deque
-from datetime import datetime
+import secrets
+import time
 from pathlib import Path
-from typing import Optional, Union, List
-
-from cached_property import cached_property_with_ttl
-from mcstatus import JavaServer
+from typing import Callable, Dict, Iterable, Optional, Union, List, Tuple
 
 from mc_server_interaction.exceptions import (
     ServerRunningException,
+    ServerNotRunningException,
     ServerNotInstalledException, NotAWorldFolderException, WorldExistsException,
 )
 from mc_server_interaction.interaction.models import (
@@ -22,20 +20,45 @@ from mc_server_interaction.interaction.models import (
     BannedPlayer,
     OPPlayer,
 )
+from mc_server_interaction.interaction.command_queue import CommandPriority
+from mc_server_interaction.interaction.gc_log import GC_LOG_FILE, GcLogTailer, GcStats
+from mc_server_interaction.interaction.launch import build_command, publish_cds_archive
+from mc_server_interaction.interaction.log_buffer import LogBuffer
+from mc_server_interaction.interaction.log_events import EventCallback, LogEventParser, ServerEvent, ServerEventType
+from mc_server_interaction.interaction.metrics import Metric, MetricsStore
+from mc_server_interaction.interaction.players import (
+    PlayerDelta,
+    PlayerRegistry,
+    parse_banned_players,
+    parse_op_players,
+    parse_whitelisted_players,
+)
 from mc_server_interaction.interaction.property_handler import ServerProperties
-from mc_server_interaction.interaction.server_process import ServerProcess, Callback
+from mc_server_interaction.interaction.rcon import RconClient
+from mc_server_interaction.interaction.resource_sampler import ResourceSampler, default_sampler
+from mc_server_interaction.interaction.server_process import ServerProcess, Callback, OutputStream, OverflowPolicy
+from mc_server_interaction.interaction.server_query import ServerQuery
+from mc_server_interaction.interaction.subscription import Subscription, SubscriptionEvent, SubscriptionKind
+from mc_server_interaction.interaction.telemetry import TickTelemetry
 from mc_server_interaction.interaction.worlds import MinecraftWorld
 from mc_server_interaction.manager.models import WorldGenerationSettings
+from mc_server_interaction.utils import game_constants
+from mc_server_interaction.utils.file_cache import file_cache
+from mc_server_interaction.utils.scheduler import Job, Scheduler, default_scheduler
 
 
 class ServerCallbacks:
 
     def __init__(self):
         self.output = Callback()
+        self.output_batch = Callback()
         self.status = Callback()
         self.properties = Callback()
-        self.system_metrics = Callback()
+        self.system_metrics = Callback(overflow=OverflowPolicy.COALESCE)
         self.players = Callback()
+        self.events = EventCallback()
+        self.performance = Callback(overflow=OverflowPolicy.COALESCE)
+        self.gc = Callback()
 
 
 class MinecraftServer:
@@ -44,13 +67,28 @@ class MinecraftServer:
     server_config: ServerConfig
     _status: ServerStatus
     properties: ServerProperties
-    _mcstatus_server: Optional[JavaServer]
-    log: deque
+    log: LogBuffer
     callbacks: ServerCallbacks
     worlds: List[MinecraftWorld]
     active_world: MinecraftWorld
 
-    def __init__(self, server_config: ServerConfig):
+    # seconds between the periodic checks while the server is running,
+    # players are only checked every idle_interval without subscribers
+    status_interval = 1
+    metrics_interval = 1
+    metrics_publish_interval = 5
+    metrics_save_interval = 300
+    tick_query_interval = 30
+    gc_log_interval = 1
+    players_interval = 10
+    idle_interval = 30
+
+    def __init__(
+            self,
+            server_config: ServerConfig,
+            scheduler: Optional[Scheduler] = None,
+            sampler: Optional[ResourceSampler] = None,
+    ):
         self.logger = logging.getLogger(
             f"MCServerInteraction.{self.__class__.__name__}:{server_config.name.replace('.', '_')}"
         )
@@ -60,15 +98,40 @@ class MinecraftServer:
         else:
             self._status = ServerStatus.NOT_INSTALLED
         self.process: Optional[ServerProcess] = None
-        self._mcstatus_server = None
-        self.log = deque(maxlen=128)
+        self._output_task: Optional[asyncio.Task] = None
+        self._server_query: Optional[ServerQuery] = None
+        self._rcon: Optional[RconClient] = None
+        self.log = LogBuffer(server_config.log_lines)
         self.callbacks = ServerCallbacks()
+        self._event_parser = LogEventParser()
+        self._output_waiters: List[Tuple[str, asyncio.Future]] = []
+        self._event_waiters: List[Tuple[ServerEventType, asyncio.Future]] = []
+        self._status_events: Dict[ServerStatus, asyncio.Event] = {}
+        self._temp_cds_archive: Optional[str] = None
+        self._gc_log: Optional[GcLogTailer] = None
+        self._gc_logging = False
+        self.gc_stats = GcStats()
+        self.scheduler = scheduler or default_scheduler
+        self.sampler = sampler or default_sampler
+        self._jobs: List[Job] = []
+        self._system_metrics: Optional[dict] = None
+        self._last_system_metrics: Optional[dict] = None
+        self._metrics_published = 0.0
+        self.metrics = MetricsStore()
+        self.telemetry = TickTelemetry()
+        self.player_registry = PlayerRegistry()
+        self._player_files: Dict[str, list] = {}
+        self._player_deltas: List[PlayerDelta] = []
 
         self.load_properties()
         self.load_worlds()
+        self._reload_player_files()
+        self._player_deltas = []
+        if self.server_config.persist_metrics:
+            self.metrics.load(self.metrics_file)
 
-        self.callbacks.status.add_callback(self._reload_worlds)
-        asyncio.create_task(self._update_loop())
+        # the server's own handlers run inline, so they see status changes and output in order
+        self.callbacks.status.add_callback(self._reload_worlds, inline=True)
 
     def load_properties(self):
         properties_file = os.path.join(self.server_config.path, "server.properties")
@@ -88,6 +151,9 @@ class MinecraftServer:
         if not world_path.is_dir():
             return
         for entry in world_path.iterdir():
+            if entry.name.startswith("."):
+                # staging and cleanup directories of backup restores
+                continue
             if entry.is_dir():
                 try:
                     world = MinecraftWorld(entry, server_name=self.name)
@@ -104,11 +170,52 @@ class MinecraftServer:
         self.properties.set(key, value)
 
     async def set_status(self, status: ServerStatus):
+        if status == ServerStatus.STOPPING and self._status == ServerStatus.STOPPED:
+            # a late stop message or stop call after the process already exited
+            return
         if self._status != status:
             self.logger.debug(f"Setting server status to {status}")
             self._status = status
+            if status == ServerStatus.STARTING:
+                self.telemetry.reset()
+                self._start_jobs()
+            elif status == ServerStatus.STOPPED:
+                self._stop_jobs()
+                if self._gc_log is not None:
+                    await self._read_gc_log()
+                    self._gc_log.close()
+                    self._gc_log = None
+                self._server_query = None
+                if self._rcon is not None:
+                    await self._rcon.close()
+                    self._rcon = None
+                self._player_deltas += self.player_registry.set_online([])
+                await self._publish_player_deltas()
+                # publish the idle metrics once instead of keeping the last values of the running server
+                self._system_metrics = None
+                await self._publish_system_metrics(self.system_load)
+                await self._save_metrics()
+            if self._status == status:
+                for event_status, event in self._status_events.items():
+                    if event_status == status:
+                        event.set()
+                    else:
+                        event.clear()
             await self.callbacks.status(status)
 
+    async def wait_until(self, status: ServerStatus, timeout: Optional[float] = None):
+        """
+        Wait until the server has the given status.
+        :param status: The status to wait for, returns immediately if the server already has it
+        :param timeout: Maximum time to wait in seconds, raises asyncio.TimeoutError when it expired
+        """
+        if self._status == status:
+            return
+        event = self._status_events.get(status)
+        if event is None:
+            event = self._status_events[status] = asyncio.Event()
+        await asyncio.wait_for(event.wait(), timeout)
+
     async def set_active_world(self, world_name: str, new: bool = False):
         """
         Set the world for the server. Restarts the server if it is running.
@@ -150,7 +257,13 @@ class MinecraftServer:
         for name, value in world_generation_settings:
             self.properties.set(name, value)
 
-    async def start(self):
+    async def start(self, gc_logging: Optional[bool] = None):
+        """
+        Start the server process. Use wait_until(ServerStatus.RUNNING) to wait for the server to be ready.
+        :param gc_logging: Write a GC log to gc.log in the server directory and publish the collections on
+            callbacks.gc and in gc_stats, needs Java 9+. Keeps the setting of the previous start if None, so
+            restarts keep logging
+        """
         if self.is_running:
             raise ServerRunningException()
         if (
@@ -161,22 +274,30 @@ class MinecraftServer:
         jar_path = os.path.join(self.server_config.path, "server.jar")
         if not os.path.exists(jar_path):
             raise FileNotFoundError()
+        if gc_logging is None:
+            gc_logging = self._gc_logging
+        self._gc_logging = gc_logging
         self.logger.info("Starting server")
         self.save_properties()
-        command = [
-            "java",
-            f"-Xmx{self.server_config.ram}M",
-            f"-Xms{self.server_config.ram}M",
-            "-jar",
-            jar_path,
-            "--nogui",
-        ]
-        self.process = ServerProcess(self.name)
+        # relative to the server directory, so a CDS archive matches the class path of every server of a version
+        command, self._temp_cds_archive = build_command(
+            self.server_config, "server.jar", GC_LOG_FILE if gc_logging else None
+        )
+        self._gc_log = None
+        if gc_logging:
+            self.gc_stats.reset()
+            self._gc_log = GcLogTailer(os.path.join(self.server_config.path, GC_LOG_FILE), time.time())
+        self.logger.debug(f"Launch command: {' '.join(command)}")
+        self.process = ServerProcess(
+            self.name, self.sampler, self.server_config.command_rate, self.server_config.command_burst
+        )
         await self.process.start(command, self.server_config.path)
         self.logger.debug("Create asyncio task for stdout callback")
-        asyncio.create_task(self.process.read_output())
+        self._output_task = asyncio.create_task(self.process.read_output())
 
-        self.process.callbacks.stdout.add_callback(self._update_status_callback)
+        self.process.callbacks.stdout.add_callback(self._process_output, inline=True)
+        self.process.callbacks.stderr.add_callback(self._process_error_output, inline=True)
+        self.process.callbacks.exit.add_callback(self._process_exited, inline=True)
         await self.set_status(ServerStatus.STARTING)
 
     @property
@@ -189,7 +310,7 @@ class MinecraftServer:
         """
         if self.is_online:
             self.logger.info("Stopping server")
-            await self.process.send_input("stop")
+            await self.process.send_input("stop", CommandPriority.HIGH)
             await self.set_status(ServerStatus.STOPPING)
         else:
             self.logger.warning("Server not running")
@@ -202,19 +323,32 @@ class MinecraftServer:
         """
         if self.is_online:
             await self.stop()
-            for i in range(timeout):
-                await asyncio.sleep(1)
-                if not self.is_running:
-                    return
+            try:
+                await self.wait_until(ServerStatus.STOPPED, timeout)
+                return
+            except asyncio.TimeoutError:
+                pass
             # kill if timeout expired
             self.logger.error("Timeout expired, killing server")
             self.kill()
-            await asyncio.sleep(1)
-            await self.set_status(ServerStatus.STOPPED)
-            self.save_properties()
+            try:
+                await self.wait_until(ServerStatus.STOPPED, 5)
+            except asyncio.TimeoutError:
+                self.process = None
+                await self.set_status(ServerStatus.STOPPED)
+                self.save_properties()
         else:
             self.logger.warning("Server not running")
 
+    async def restart(self, timeout: float = 120):
+        """
+        Shut the server down and start it again as soon as the process exited.
+        Use wait_until(ServerStatus.RUNNING) to wait for the server to be ready.
+        :param timeout: The maximum time to wait for the shutdown in seconds before the process will be killed
+        """
+        await self.shutdown(timeout)
+        await self.start()
+
     def kill(self):
         if self.is_running:
             self.logger.info("Killing server process")
@@ -224,104 +358,63 @@ class MinecraftServer:
     def status(self) -> ServerStatus:
         return self._status
 
-    @cached_property_with_ttl(ttl=5)
+    @property
     def system_load(self) -> dict:
+        """
+        The latest resource usage sample, taken every metrics_interval while the server is running.
+        """
         if self.is_running:
-            return self.process.get_resource_usage()
+            if self._system_metrics is None:
+                self._system_metrics = self.process.get_resource_usage()
+            return self._system_metrics
         return {
             "cpu": {"percent": 0},
             "memory": {"total": 0, "used": 0, "server": 0},
         }
 
-    @cached_property_with_ttl(ttl=30)
-    def banned_players(self):
-        banned_players = []
-        banned_players_file = os.path.join(
-            self.server_config.path, "banned-players.json"
-        )
-        if os.path.isfile(banned_players_file):
-            self.logger.debug(f"Loading banned players from {banned_players_file}")
-            with open(banned_players_file, "r") as f:
-                data = json.load(f)
-            for player_data in data:
-                name = player_data["name"]
-                timestamp = datetime.strptime(
-                    player_data["created"].split(" +")[0], "%Y-%m-%d %H:%M:%S"
-                ).timestamp()
-                player = BannedPlayer(name)
-                player.is_banned = True
-                player.banned_since = timestamp
-                player.ban_reason = player_data["reason"]
-                banned_players.append(player)
-        return banned_players
-
-    @cached_property_with_ttl(ttl=30)
-    def op_players(self):
-        op_players = []
-        op_players_file = os.path.join(self.server_config.path, "ops.json")
-        if os.path.isfile(op_players_file):
-            self.logger.debug(f"Loading op players from {op_players_file}")
-            with open(op_players_file, "r") as f:
-                data = json.load(f)
-            for player_data in data:
-                name = player_data["name"]
-                player = OPPlayer(name)
-                player.is_op = True
-                player.op_level = player_data["level"]
-                op_players.append(player)
-        return op_players
-
-    @cached_property_with_ttl(ttl=10)
-    def online_players(self):
-        online_players = []
-        if self._mcstatus_server is not None:
-            online_players = self._mcstatus_server.query().players.names
-        online_players = [Player(name=name, is_online=True) for name in online_players]
-        return online_players
-
-    @cached_property_with_ttl(ttl=30)
-    def whitelisted_players(self):
-        whitelisted_players = []
-        whitelist_file = os.path.join(self.server_config.path, "whitelist.json")
-        if os.path.isfile(whitelist_file):
-            self.logger.debug(f"Loading whitelisted players from {whitelist_file}")
-            with open(whitelist_file, "r") as f:
-                data = json.load(f)
-            for player_data in data:
-                name = player_data["name"]
-                player = Player(name)
-                whitelisted_players.append(player)
-        return whitelisted_players
-
-    @cached_property_with_ttl(ttl=10)
-    def players(self):
-        players = []
-        banned_players = self.banned_players
-        op_players = self.op_players
-        op_players = list(
-            filter(
-                lambda player: not any(
-                    banned_player.name == player.name
-                    for banned_player in banned_players
-                ),
-                op_players,
-            )
-        )  # players can be op and banned for some reason, so filter ops
-
-        online_players = self.online_players
-        for player in online_players:
-            op_player = next((p for p in op_players if p.name == player.name), None)
-            if op_player is not None:
-                op_player.is_online = True
-                player.is_op = True
-            players.append(player)
-
-        players_dict = {
-            "online_players": players,
-            "op_players": op_players,
-            "banned_players": banned_players,
-        }
-        return players_dict
+    @property
+    def banned_players(self) -> List[BannedPlayer]:
+        return [copy.copy(player) for player in self._load_player_file("banned-players.json", parse_banned_players)]
+
+    @property
+    def op_players(self) -> List[OPPlayer]:
+        return [copy.copy(player) for player in self._load_player_file("ops.json", parse_op_players)]
+
+    @property
+    def online_players(self) -> List[Player]:
+        return [self.player_registry.get_player(name) for name in self.player_registry.online]
+
+    @property
+    def whitelisted_players(self) -> List[Player]:
+        return [copy.copy(player) for player in self._load_player_file("whitelist.json", parse_whitelisted_players)]
+
+    def _load_player_file(self, file_name: str, parser: Callable[[str], list]) -> list:
+        return file_cache.get(os.path.join(self.server_config.path, file_name), parser, [])
+
+    @property
+    def players(self) -> Dict[str, List[Player]]:
+        """
+        Snapshot of the online, op and banned players. Changes are published as deltas on callbacks.players.
+        """
+        self._reload_player_files()
+        return self.player_registry.snapshot()
+
+    def _reload_player_files(self):
+        for file_name, parser, update in (
+                ("ops.json", parse_op_players, self.player_registry.set_ops),
+                ("banned-players.json", parse_banned_players, self.player_registry.set_banned),
+        ):
+            # the file cache returns the same list until the file changes
+            players = self._load_player_file(file_name, parser)
+            if self._player_files.get(file_name) is players:
+                continue
+            self._player_files[file_name] = players
+            self._player_deltas += update(players)
+
+    async def _publish_player_deltas(self):
+        deltas, self._player_deltas = self._player_deltas, []
+        if deltas and len(self.callbacks.players) > 0:
+            await self.callbacks.players([dataclasses.asdict(delta) for delta in deltas])
 
     def get_world(self, name: str):
         if len(self.worlds) > 0:
@@ -331,15 +424,65 @@ class MinecraftServer:
     def world_exits(self, name: str):
         return self.get_world(name) is not None
 
-    async def send_command(self, command: str):
+    def enable_rcon(self, password: Optional[str] = None, port: int = 25575):
+        """
+        Enable RCON in the server properties, takes effect on the next start.
+        :param password: The RCON password, a random one if None
+        :param port: The RCON port
+        """
+        self.set_property("enable-rcon", True)
+        self.set_property("rcon.port", port)
+        self.set_property("rcon.password", password or secrets.token_urlsafe(24))
+        self.save_properties()
+
+    @property
+    def rcon_available(self) -> bool:
+        return self.is_online and self._rcon is not None
+
+    async def send_command(
+            self,
+            command: str,
+            wait_response: bool = False,
+            priority: int = CommandPriority.NORMAL,
+    ) -> Optional[str]:
+        """
+        :param command: The command, with or without leading slash
+        :param wait_response: Send the command over RCON and return its output. Falls back to the console without
+            output if RCON is not enabled in the server properties
+        :param priority: One of CommandPriority, the position in the console command queue
+        :return: The output of the command if it was sent over RCON
+        """
         if self.is_online:
             if command.startswith("/"):
                 command = command.lstrip("/")
 
-            await self._send_command(command)
+            if wait_response and self._rcon is not None:
+                self.logger.info(f"Sending command {command} to server over RCON")
+                return await self._rcon.command(command)
+            await self._send_command(command, priority)
 
         else:
             self.logger.warning("Server not running")
+        return None
+
+    def send_commands(
+            self,
+            commands: Iterable[str],
+            priority: int = CommandPriority.NORMAL,
+    ) -> List[asyncio.Future]:
+        """
+        Queue many console commands at once. They are written in batches within the command rate of the server.
+        :param commands: The commands, with or without leading slash
+        :param priority: One of CommandPriority
+        :return: A future per command, done when it was sent. It fails with ServerNotRunningException if the server
+            stops before the command was sent
+        :raises ServerNotRunningException: If the server is not running
+        """
+        commands = [command.lstrip("/") for command in commands]
+        if not self.is_online:
+            raise ServerNotRunningException("Server not running")
+        self.logger.info(f"Sending {len(commands)} commands to server")
+        return self.process.send_inputs(commands, priority)
 
     @property
     def is_running(self) -> bool:
@@ -351,67 +494,298 @@ class MinecraftServer:
 
     @property
     def logs(self):
-        return "\n".join(self.log) + ("\n" if self.log else "")
+        return "\n".join(self.log) + ("\n" if len(self.log) else "")
+
+    def get_logs_since(self, seq: int, limit: Optional[int] = None) -> Tuple[List[str], int]:
+        """
+        Get the output lines with a sequence number greater or equal to seq.
+        Pass the returned sequence number on the next call to only receive new lines.
+        :param seq: Sequence number of the first line to return
+        :param limit: Maximum number of lines to return
+        :return: The lines and the sequence number of the next line
+        """
+        return self.log.get_since(seq, limit)
+
+    def subscribe(
+            self,
+            kinds: Optional[Iterable[str]] = None,
+            since_seq: Optional[int] = None,
+            maxsize: int = 4096,
+    ) -> Subscription:
+        """
+        Subscribe to server output, status, players, system metrics and events as async iterator:
+
+            async with server.subscribe([SubscriptionKind.OUTPUT], since_seq=cursor) as subscription:
+                async for event in subscription:
+                    ...
+
+        :param kinds: SubscriptionKind values to receive, all kinds if None
+        :param since_seq: Replay the buffered output lines starting at this sequence number before live output
+        :param maxsize: Number of events to buffer, the oldest events are dropped if the consumer falls behind
+        :return: The subscription
+        """
+        subscription = Subscription(maxsize)
+        self.attach_subscription(subscription, kinds, since_seq)
+        return subscription
+
+    def attach_subscription(
+            self,
+            subscription: Subscription,
+            kinds: Optional[Iterable[str]] = None,
+            since_seq: Optional[int] = None,
+            sid: Optional[str] = None,
+    ):
+        """
+        Feed the events of this server into an existing subscription.
+        :param subscription: The subscription
+        :param kinds: SubscriptionKind values to receive, all kinds if None
+        :param since_seq: Replay the buffered output lines starting at this sequence number before live output
+        :param sid: Server id the events are tagged with
+        """
+        kinds = SubscriptionKind.ALL if kinds is None else frozenset(kinds)
+        if SubscriptionKind.OUTPUT in kinds:
+            # the live handler is installed without awaiting after the replay, lines which were already replayed
+            # but are still dispatched live are skipped by their sequence number
+            live_from = None
+            if since_seq is not None:
+                live_from = max(self.log.next_seq, since_seq)
+                lines, _ = self.log.get_since(since_seq)
+                for seq, line in zip(range(self.log.next_seq - len(lines), self.log.next_seq), lines):
+                    subscription.put(SubscriptionEvent(SubscriptionKind.OUTPUT, line, sid, seq))
+
+            def on_output(target: Subscription, lines: List[str], stream: str, first_seq: int):
+                for seq, line in enumerate(lines, first_seq):
+                    if live_from is None or seq >= live_from:
+                        target.put(SubscriptionEvent(SubscriptionKind.OUTPUT, line, sid, seq, stream))
+
+            subscription.attach(self.callbacks.output_batch, on_output)
+
+        for kind, callback in (
+                (SubscriptionKind.STATUS, self.callbacks.status),
+                (SubscriptionKind.PLAYERS, self.callbacks.players),
+                (SubscriptionKind.SYSTEM_METRICS, self.callbacks.system_metrics),
+                (SubscriptionKind.EVENTS, self.callbacks.events),
+                (SubscriptionKind.PERFORMANCE, self.callbacks.performance),
+                (SubscriptionKind.GC, self.callbacks.gc),
+        ):
+            if kind in kinds:
+                subscription.attach(
+                    callback, lambda target, data, kind=kind: target.put(SubscriptionEvent(kind, data, sid))
+                )
+        # start the periodic updates now instead of after the idle interval
+        for job in self._jobs:
+            self.scheduler.reschedule(job)
+
+    def expect_output(self, text: str) -> asyncio.Future:
+        """
+        Create a future which resolves with the next output line containing text.
+        Create it before sending the command which causes the output to not miss the line.
+        :param text: The text to wait for
+        :return: Future resolving to the matching output line
+        """
+        future = asyncio.get_event_loop().create_future()
+        self._output_waiters.append((text, future))
+        return future
+
+    def expect_event(self, event_type: ServerEventType) -> asyncio.Future:
+        """
+        Create a future which resolves with the next server event of the given type.
+        Create it before sending the command which causes the event to not miss it.
+        :param event_type: The type of event to wait for
+        :return: Future resolving to the ServerEvent
+        """
+        future = asyncio.get_event_loop().create_future()
+        self._event_waiters.append((event_type, future))
+        return future
 
-    async def _send_command(self, command):
+    async def _send_command(self, command: str, priority: int = CommandPriority.NORMAL):
         self.logger.info(f"Sending command {command} to server")
-        await self.process.send_input(command)
+        await self.process.send_input(command, priority)
+
+    async def _process_output(self, lines: List[str], stream: str = OutputStream.STDOUT):
+        first_seq = self.log.next_seq
+        for output in lines:
+            await self._update_status_callback(output)
+        await self.callbacks.output_batch(lines, stream, first_seq)
+
+    async def _process_error_output(self, lines: List[str]):
+        await self._process_output(lines, OutputStream.STDERR)
 
     async def _update_status_callback(self, output: str):
         self.log.append(output)
+        _, event = self._event_parser.parse(output)
+        if self._output_waiters:
+            self._output_waiters = self._resolve_waiters(
+                self._output_waiters, lambda text: text in output, output
+            )
         await self.callbacks.output(output)
-        if self._status == ServerStatus.STARTING:
-            if 'For help, type "help"' in output:
+        if event is None:
+            return
+        await self._handle_event(event)
+        if self._event_waiters:
+            self._event_waiters = self._resolve_waiters(
+                self._event_waiters, lambda event_type: event_type == event.type, event
+            )
+        if len(self.callbacks.events) > 0:
+            await self.callbacks.events(event)
+
+    async def _handle_event(self, event: ServerEvent):
+        if event.type == ServerEventType.STARTED:
+            if self._status == ServerStatus.STARTING:
+                query_port = None
                 if self.properties.get("enable-query"):
-                    self._mcstatus_server = JavaServer(
-                        "localhost", self.properties.get("server-port")
+                    query_port = self.properties.get("query.port", self.properties.get("server-port"))
+                self._server_query = ServerQuery(
+                    self.name, "localhost", self.properties.get("server-port", 25565), query_port
+                )
+                if self.properties.get("enable-rcon") and self.properties.get("rcon.password"):
+                    self._rcon = RconClient(
+                        self.name, str(self.properties.get("rcon.password")), "localhost",
+                        self.properties.get("rcon.port", 25575)
                     )
                 await self.set_status(ServerStatus.RUNNING)
-        if "[Server thread/INFO]: Stopping the server" in output:
+        elif event.type == ServerEventType.STOPPING:
             await self.set_status(ServerStatus.STOPPING)
-        if (
-                "[Server thread/INFO]: ThreadedAnvilChunkStorage: All dimensions are saved"
-                in output
-        ):
-            self._mcstatus_server = None
+        elif event.type in (ServerEventType.LAG, ServerEventType.TICK_STATS):
+            if self.telemetry.handle(event):
+                await self._publish_performance()
+        elif event.type == ServerEventType.PLAYER_AUTHENTICATED:
+            self.player_registry.authenticated(event.data["player"], event.data["uuid"])
+        elif event.type == ServerEventType.PLAYER_JOINED:
+            self._player_deltas += self.player_registry.join(event.data["player"])
+            await self._publish_player_deltas()
+        elif event.type == ServerEventType.PLAYER_LEFT:
+            self._player_deltas += self.player_registry.leave(event.data["player"])
+            await self._publish_player_deltas()
+
+    async def _process_exited(self, returncode: int, _):
+        if self.process is not None and self.process.is_running():
+            # exit of a previous process after the server was started again
+            return
+        self.logger.debug(f"Server process exited with code {returncode}")
+        self.process = None
+        if self._temp_cds_archive is not None:
+            publish_cds_archive(self._temp_cds_archive, returncode)
+            self._temp_cds_archive = None
+        await self.set_status(ServerStatus.STOPPED)
+        self.save_properties()
+
+    @staticmethod
+    def _resolve_waiters(waiters: list, matches: Callable, result) -> list:
+        remaining = []
+        for condition, future in waiters:
+            if future.done():
+                continue
+            if matches(condition):
+                future.set_result(result)
+                continue
+            remaining.append((condition, future))
+        return remaining
+
+    def _start_jobs(self):
+        if self._jobs:
+            return
+        self._jobs = [
+            self.scheduler.add_job(self._check_process, self.status_interval, self.status_interval),
+            self.scheduler.add_job(self._update_system_metrics, self.metrics_interval),
+            self.scheduler.add_job(self._save_metrics, self.metrics_save_interval, self.metrics_save_interval),
+            self.scheduler.add_job(self._update_performance, self.tick_query_interval, self.tick_query_interval),
+            self.scheduler.add_job(self._update_players, self.players_interval),
+        ]
+        if self._gc_log is not None:
+            self._jobs.append(self.scheduler.add_job(self._read_gc_log, self.gc_log_interval, self.gc_log_interval))
+
+    def _stop_jobs(self):
+        for job in self._jobs:
+            self.scheduler.remove_job(job)
+        self._jobs = []
+
+    async def _check_process(self):
+        if self._output_task is not None and not self._output_task.done():
+            # the exit callback sets the status once the remaining output was handled
+            return
+        if not self.is_running:
             self.process = None
             await self.set_status(ServerStatus.STOPPED)
-            self.save_properties()
 
-    async def _update_loop(self):
-        callbacks = {
-            "players": self.callbacks.players,
-            "system_metrics": self.callbacks.system_metrics
-        }
-        old_variables = {
-            "system_metrics": None,
-            "players": None
+    async def _update_system_metrics(self):
+        if not self.is_running:
+            return
+        system_metrics = self._system_metrics = self.process.get_resource_usage()
+        values = {
+            Metric.CPU: system_metrics["cpu"]["percent"],
+            Metric.MEMORY: system_metrics["memory"]["server"],
+            Metric.SYSTEM_MEMORY: system_metrics["memory"]["used"],
+            Metric.PLAYERS: len(self.player_registry.online),
         }
-        while True:
-            if self._status not in [ServerStatus.STOPPED, ServerStatus.NOT_INSTALLED, ServerStatus.INSTALLING]:
-                if not self.is_running:
-                    self.process = None
-                    await self.set_status(ServerStatus.STOPPED)
-
-            for callback_name in callbacks.keys():
-                callback = callbacks[callback_name]
-                value = None
-                if len(callback) > 0:
-                    if callback_name == "players":
-                        players = self.players
-                        players = {
-                            "online_players": [dataclasses.asdict(player) for player in players["online_players"]],
-                            "op_players": [dataclasses.asdict(player) for player in players["op_players"]],
-                            "banned_players": [dataclasses.asdict(player) for player in players["banned_players"]]
-                        }
-                        value = players
-                    elif callback_name == "system_metrics":
-                        value = self.system_load
-                if value != old_variables[callback_name]:
-                    await callback(value)
-                    old_variables[callback_name] = value
-
-            await asyncio.sleep(1)
+        if self.is_online:
+            values[Metric.TPS] = self.telemetry.tps
+            if self.telemetry.mspt is not None:
+                values[Metric.MSPT] = self.telemetry.mspt
+        self.metrics.record(values)
+        # the history and system_load need every sample, only publishing is skipped without subscribers
+        if time.monotonic() - self._metrics_published >= self.metrics_publish_interval:
+            await self._publish_system_metrics(system_metrics)
+
+    async def _publish_system_metrics(self, system_metrics: dict):
+        if len(self.callbacks.system_metrics) > 0 and system_metrics != self._last_system_metrics:
+            self._last_system_metrics = system_metrics
+            self._metrics_published = time.monotonic()
+            await self.callbacks.system_metrics(system_metrics)
+
+    async def _update_performance(self):
+        if not self.is_online:
+            return
+        command = self._tick_command()
+        if command is not None:
+            self.logger.debug(f"Querying tick times with {command}")
+            await self.process.send_input(command, CommandPriority.LOW)
+        else:
+            # without measurements the estimate recovers as lag warnings leave the window
+            await self._publish_performance()
+
+    def _tick_command(self) -> Optional[str]:
+        try:
+            version = tuple(int(part) for part in self.server_config.version.split("."))
+        except ValueError:
+            # snapshots and unknown version formats
+            return None
+        if version >= game_constants.Commands.TICK_QUERY_VERSION:
+            return game_constants.Commands.TICK_QUERY
+        return None
+
+    async def _read_gc_log(self):
+        if self._gc_log is None:
+            return
+        for event in self._gc_log.read():
+            self.gc_stats.add(event)
+            if len(self.callbacks.gc) > 0:
+                await self.callbacks.gc(dataclasses.asdict(event))
+
+    async def _publish_performance(self):
+        if len(self.callbacks.performance) > 0:
+            await self.callbacks.performance(dataclasses.asdict(self.telemetry.stats()))
+
+    @property
+    def metrics_file(self) -> str:
+        return os.path.join(self.server_config.path, "metrics.dat")
+
+    async def _save_metrics(self):
+        if self.server_config.persist_metrics:
+            await asyncio.get_event_loop().run_in_executor(None, self.metrics.save, self.metrics_file)
+
+    async def _update_players(self) -> Optional[float]:
+        if len(self.callbacks.players) == 0:
+            return self.idle_interval
+        self._reload_player_files()
+        server_query = self._server_query
+        if server_query is not None and server_query.complete and server_query.is_stale:
+            # catch joins and leaves which did not show up in the log
+            updated = server_query.updated
+            online_players = await server_query.update()
+            if server_query.updated != updated and server_query is self._server_query:
+                self._player_deltas += self.player_registry.set_online(online_players)
+        await self._publish_player_deltas()
 
     async def _reload_worlds(self, status: ServerStatus):
         if status == ServerStatus.RUNNING:
@@ -1,93 +1,330 @@
 import asyncio
+import codecs
 import logging
-from typing import Callable
+import time
+from enum import Enum
+from typing import Callable, Dict, Iterable, List, Optional
 
-import psutil
+from mc_server_interaction.interaction.command_queue import CommandPriority, CommandQueue
+from mc_server_interaction.interaction.resource_sampler import ResourceSampler, default_sampler
 
+logger = logging.getLogger("MCServerInteraction.Callback")
 
-class Callback:
-    def __init__(self):
-        self.installed_callbacks = []
 
-    async def __call__(self, *args, **kwargs):
-        for func in self.installed_callbacks:
+class OverflowPolicy(Enum):
+    BLOCK = 0
+    DROP_OLDEST = 1
+    COALESCE = 2
+
+
+class CallbackSubscriber:
+    """
+    A function installed on a Callback. Coroutine functions get their own queue and consumer task, so a slow
+    subscriber does not delay the others. Plain functions and inline coroutine functions are called directly.
+    """
+
+    def __init__(
+            self,
+            func: Callable,
+            maxsize: int,
+            overflow: OverflowPolicy,
+            accepts: Optional[Callable[..., bool]],
+            on_error: Callable[["CallbackSubscriber"], None],
+            inline: bool = False,
+    ):
+        self.func = func
+        self.overflow = overflow
+        self.accepts = accepts
+        self.is_async = asyncio.iscoroutinefunction(func)
+        self.inline = inline
+        self.queue = asyncio.Queue(maxsize=maxsize if overflow != OverflowPolicy.COALESCE else 1)
+        self.task: Optional[asyncio.Task] = None
+        self._on_error = on_error
+        self.delivered = 0
+        self.dropped = 0
+        self.errors = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    async def deliver(self, args: tuple, kwargs: dict):
+        if self.accepts is not None and not self.accepts(*args, **kwargs):
+            return
+        if not self.is_async:
+            self._call_sync(args, kwargs)
+            return
+        if self.inline:
+            await self._call_inline(args, kwargs)
+            return
+        if self.task is None:
+            self.task = asyncio.get_running_loop().create_task(self._consume())
+        item = (args, kwargs, time.monotonic())
+        if self.overflow == OverflowPolicy.BLOCK:
+            await self.queue.put(item)
+            return
+        if self.queue.full():
+            # DROP_OLDEST drops the oldest queued call, COALESCE replaces the pending call with the newest one
+            self.queue.get_nowait()
+            self.queue.task_done()
+            self.dropped += 1
+        self.queue.put_nowait(item)
+
+    def _call_sync(self, args: tuple, kwargs: dict):
+        start = time.monotonic()
+        try:
+            self.func(*args, **kwargs)
+        except Exception as e:
+            self._failed(e)
+            return
+        self._record(start)
+
+    async def _call_inline(self, args: tuple, kwargs: dict):
+        start = time.monotonic()
+        try:
+            await self.func(*args, **kwargs)
+        except Exception as e:
+            self._failed(e)
+            return
+        self._record(start)
+
+    async def _consume(self):
+        # the task ends when the queue is empty, so no idle tasks are left behind when the callback is dropped
+        while not self.queue.empty():
+            args, kwargs, queued_at = self.queue.get_nowait()
             try:
-                await func(*args, **kwargs)
+                await self.func(*args, **kwargs)
             except Exception as e:
-                print(e)
-                self.installed_callbacks.remove(func)
+                self.queue.task_done()
+                self._failed(e)
+                return
+            self._record(queued_at)
+            self.queue.task_done()
+        self.task = None
+
+    def _record(self, start: float):
+        latency = time.monotonic() - start
+        self.delivered += 1
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+
+    def _failed(self, e: Exception):
+        self.errors += 1
+        self._on_error(self)
+        logger.exception(f"Removing callback {getattr(self.func, '__qualname__', self.func)} after error: {e}")
+
+    def cancel(self):
+        if self.task is not None and self.task is not asyncio.current_task():
+            self.task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "callback": getattr(self.func, "__qualname__", repr(self.func)),
+            "queued": self.queue.qsize(),
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "avg_latency": self.total_latency / self.delivered if self.delivered else 0.0,
+            "max_latency": self.max_latency,
+        }
+
+
+class Callback:
+    """
+    Dispatches calls to all installed functions. Every coroutine function is called from its own task with a
+    bounded queue, the overflow policy decides what happens when that queue is full:
+    BLOCK waits for space, DROP_OLDEST discards the oldest queued call and COALESCE only keeps the newest call.
+    Inline functions are awaited by the caller in the order they were added instead, for handlers which must see
+    every call in order. Functions which raise an exception are removed.
+    """
+
+    def __init__(self, maxsize: int = 1024, overflow: OverflowPolicy = OverflowPolicy.BLOCK):
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.subscribers: Dict[Callable, CallbackSubscriber] = {}
+
+    async def __call__(self, *args, **kwargs):
+        for subscriber in list(self.subscribers.values()):
+            await subscriber.deliver(args, kwargs)
 
     def __len__(self):
-        return len(self.installed_callbacks)
+        return len(self.subscribers)
+
+    @property
+    def installed_callbacks(self) -> List[Callable]:
+        return list(self.subscribers)
+
+    def add_callback(
+            self,
+            func: Callable,
+            maxsize: Optional[int] = None,
+            overflow: Optional[OverflowPolicy] = None,
+            accepts: Optional[Callable[..., bool]] = None,
+            inline: bool = False,
+    ):
+        """
+        :param func: Function or coroutine function to call
+        :param maxsize: Size of the queue of this function, defaults to the size set for the callback
+        :param overflow: Policy when the queue is full, defaults to the policy set for the callback
+        :param accepts: Only call func if this returns True for the arguments
+        :param inline: Await func when the callback is called instead of queueing the call
+        """
+        self.subscribers[func] = CallbackSubscriber(
+            func, maxsize or self.maxsize, overflow or self.overflow, accepts, self._remove_subscriber, inline
+        )
+
+    def remove_callback(self, func: Callable):
+        subscriber = self.subscribers.pop(func, None)
+        if subscriber is not None:
+            subscriber.cancel()
+
+    async def join(self):
+        """
+        Wait until all queued calls have been handled.
+        """
+        for subscriber in list(self.subscribers.values()):
+            await subscriber.queue.join()
 
-    def add_callback(self, func: Callable):
-        self.installed_callbacks.append(func)
+    def stats(self) -> List[dict]:
+        """
+        :return: Delivery counters and latencies in seconds of every installed function
+        """
+        return [subscriber.stats() for subscriber in self.subscribers.values()]
+
+    def _remove_subscriber(self, subscriber: CallbackSubscriber):
+        if self.subscribers.get(subscriber.func) is subscriber:
+            self.remove_callback(subscriber.func)
+
+
+class OutputStream:
+    STDOUT = "stdout"
+    STDERR = "stderr"
 
 
 class Callbacks:
     def __init__(self):
         self.stdout = Callback()
+        self.stderr = Callback()
         self.exit = Callback()
         self.error_occurred = Callback()
 
 
 class ServerProcess:
+    read_size = 64 * 1024
+    max_pending_batches = 64
 
-    async def start(self, command, cwd):
+    async def start(self, command, cwd, merge_stderr: bool = False):
+        """
+        :param command: The command to run
+        :param cwd: The working directory
+        :param merge_stderr: Redirect stderr into stdout instead of reading it separately
+        """
         self.process = await asyncio.create_subprocess_exec(
             *command,
             stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT if merge_stderr else asyncio.subprocess.PIPE,
             stdin=asyncio.subprocess.PIPE,
             cwd=cwd,
         )
-        self.psutil_proc = psutil.Process(self.process.pid)
+        self.sampler.add(self.process.pid)
+        self.commands = CommandQueue(self.process.stdin, self.server_name, self.command_rate, self.command_burst)
 
-    def __init__(self, server_name: str):
+    def __init__(
+            self,
+            server_name: str,
+            sampler: Optional[ResourceSampler] = None,
+            command_rate: float = 0,
+            command_burst: int = 1,
+    ):
+        """
+        :param server_name: Name of the server used for logging
+        :param sampler: Sampler measuring the resource usage, the shared default sampler if None
+        :param command_rate: Commands per second written to stdin, 0 for no limit
+        :param command_burst: Number of commands which can be written at once after a pause
+        """
         self.logger = logging.getLogger(f"MCServerInteraction.{self.__class__.__name__}:{server_name}")
+        self.server_name = server_name
         self.callbacks = Callbacks()
         self.system_metrics: dict = {}
-        self.num_cpus = psutil.cpu_count()
+        self.sampler = sampler or default_sampler
+        self.command_rate = command_rate
+        self.command_burst = command_burst
         self.process = None
-        self.psutil_proc = None
+        self.commands: Optional[CommandQueue] = None
 
     async def read_output(self):
-        while self.is_running():
-            output = await self.process.stdout.readline()
-            if output:
-                output = output.decode("utf-8")
-                output = output.rstrip("\n")
-                await self.callbacks.stdout(output)
-        await self.callbacks.exit(
-            self.process.returncode, await self.process.stdout.read()
-        )
-        self.psutil_proc = None
+        """
+        Read stdout and stderr until the process closes them. Lines are passed to the stdout and stderr callbacks
+        in batches. Reading pauses while too many batches are waiting to be handled, so the output applies
+        backpressure to the server instead of piling up in memory.
+        """
+        queue = asyncio.Queue(maxsize=self.max_pending_batches)
+        dispatcher = asyncio.create_task(self._dispatch_output(queue))
+        readers = [self._read_stream(self.process.stdout, OutputStream.STDOUT, queue)]
+        if self.process.stderr is not None:
+            readers.append(self._read_stream(self.process.stderr, OutputStream.STDERR, queue))
+        try:
+            await asyncio.gather(*readers)
+        finally:
+            await queue.put(None)
+            await dispatcher
+        await self.process.wait()
+        self.sampler.remove(self.process.pid)
+        self.commands.close()
+        await self.callbacks.exit(self.process.returncode, b"")
+
+    async def _read_stream(self, stream: asyncio.StreamReader, name: str, queue: asyncio.Queue):
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        partial = ""
+        while True:
+            chunk = await stream.read(self.read_size)
+            if not chunk:
+                break
+            lines = (partial + decoder.decode(chunk)).split("\n")
+            partial = lines.pop()
+            if lines:
+                await queue.put((name, [line.rstrip("\r") for line in lines]))
+        partial += decoder.decode(b"", final=True)
+        if partial:
+            await queue.put((name, [partial.rstrip("\r")]))
+
+    async def _dispatch_output(self, queue: asyncio.Queue):
+        callbacks = {OutputStream.STDOUT: self.callbacks.stdout, OutputStream.STDERR: self.callbacks.stderr}
+        item = await queue.get()
+        while item is not None:
+            name, lines = item
+            fetched_next = False
+            # merge batches of the same stream which queued up while the previous batch was handled
+            while not queue.empty():
+                item = queue.get_nowait()
+                if item is not None and item[0] == name:
+                    lines.extend(item[1])
+                    continue
+                fetched_next = True
+                break
+            await callbacks[name](lines)
+            if not fetched_next:
+                item = await queue.get()
 
     def kill(self):
         self.logger.info("Killing process")
         self.process.kill()
-        self.psutil_proc = None
 
     def is_running(self):
         return self.process.returncode is None
 
-    async def send_input(self, inp: str):
-        if not inp.endswith("\n"):
-            inp += "\n"
-        self.process.stdin.write(inp.encode("utf-8"))
-        await self.process.stdin.drain()
+    async def send_input(self, inp: str, priority: int = CommandPriority.NORMAL):
+        """
+        Queue a line for stdin and wait until it was written.
+        """
+        await self.commands.submit(inp, priority)
+
+    def send_inputs(self, inputs: Iterable[str], priority: int = CommandPriority.NORMAL) -> List[asyncio.Future]:
+        """
+        Queue lines for stdin, they are written together as far as the rate limit allows.
+        :return: A future per line, done when it was written. It fails with ServerNotRunningException if the process
+            exited before
+        """
+        return self.commands.submit_many(inputs, priority)
 
     def get_resource_usage(self):
-        memory_system = psutil.virtual_memory()
-        memory_server = self.psutil_proc.memory_full_info()
-        self.system_metrics = {
-            "cpu": {
-                "percent": round(self.psutil_proc.cpu_percent() / self.num_cpus, 2)
-            },
-            "memory": {
-                "total": memory_system.total,
-                "used": memory_system.used,
-                "server": memory_server.uss,
-            },
-        }
+        self.system_metrics = self.sampler.get(self.process.pid)
         return self.system_metrics
@@ -0,0 +1,91 @@
+import asyncio
+import logging
+import time
+from typing import List, Optional
+
+from mcstatus import JavaServer
+
+
+class ServerQuery:
+    """
+    Fetches the online players of a running server without blocking the event loop.
+
+    Uses the query protocol if it is enabled and the status protocol otherwise, which only returns a sample of the
+    players on large servers. Every request has a timeout, failed requests are retried with exponential backoff.
+    The last successful result stays available while a request is pending or the server does not answer.
+    """
+
+    def __init__(
+            self,
+            server_name: str,
+            host: str = "localhost",
+            port: int = 25565,
+            query_port: Optional[int] = None,
+            timeout: float = 2,
+            max_age: float = 5,
+            max_backoff: float = 60,
+    ):
+        """
+        :param server_name: Name of the server used for logging
+        :param host: Host of the server
+        :param port: Port of the server used for status requests
+        :param query_port: Port of the query protocol, status requests are used if None
+        :param timeout: Timeout of a request in seconds
+        :param max_age: Age in seconds after which the result is stale
+        :param max_backoff: Maximum delay in seconds before retrying after failed requests
+        """
+        self.logger = logging.getLogger(f"MCServerInteraction.{self.__class__.__name__}:{server_name}")
+        self.timeout = timeout
+        self.max_age = max_age
+        self.max_backoff = max_backoff
+        self._status_client = JavaServer(host, port, timeout)
+        self._query_client = JavaServer(host, query_port, timeout) if query_port is not None else None
+
+        self.players: List[str] = []
+        self.updated: Optional[float] = None
+        self.failures = 0
+        self._retry_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def complete(self) -> bool:
+        """
+        Whether the results contain all online players, status responses only contain a sample.
+        """
+        return self._query_client is not None
+
+    @property
+    def is_stale(self) -> bool:
+        return self.updated is None or time.monotonic() - self.updated > self.max_age
+
+    async def update(self) -> List[str]:
+        """
+        Fetch the online players unless the last request failed recently.
+        :return: The player names, the last known names if the request failed
+        """
+        if time.monotonic() >= self._retry_at:
+            if self._task is None or self._task.done():
+                self._task = asyncio.create_task(self._update())
+            await asyncio.shield(self._task)
+        return self.players
+
+    async def _update(self):
+        try:
+            self.players = await asyncio.wait_for(self._fetch_players(), self.timeout)
+        except (OSError, asyncio.TimeoutError, ValueError) as e:
+            # ValueError and its subclasses are raised by mcstatus for malformed responses
+            self.failures += 1
+            backoff = min(self.max_backoff, 2 ** (self.failures - 1))
+            self._retry_at = time.monotonic() + backoff
+            self.logger.debug(f"Player query failed ({e!r}), retrying in {backoff}s")
+            return
+        self.failures = 0
+        self._retry_at = 0.0
+        self.updated = time.monotonic()
+
+    async def _fetch_players(self) -> List[str]:
+        if self._query_client is not None:
+            response = await self._query_client.async_query(tries=1)
+            return list(response.players.names)
+        response = await self._status_client.async_status(tries=1)
+        return [player.name for player in response.players.sample or []]
@@ -0,0 +1,109 @@
+import asyncio
+import weakref
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, List, Optional, Tuple
+
+from mc_server_interaction.interaction.server_process import Callback
+
+
+class SubscriptionKind:
+    OUTPUT = "output"
+    STATUS = "status"
+    PLAYERS = "players"
+    SYSTEM_METRICS = "system_metrics"
+    EVENTS = "events"
+    PERFORMANCE = "performance"
+    GC = "gc"
+
+    ALL = (OUTPUT, STATUS, PLAYERS, SYSTEM_METRICS, EVENTS, PERFORMANCE, GC)
+
+
+@dataclass
+class SubscriptionEvent:
+    kind: str
+    data: Any
+    sid: Optional[str] = None
+    seq: Optional[int] = None
+    stream: Optional[str] = None
+
+
+class Subscription:
+    """
+    Async iterator over server events. Created by MinecraftServer.subscribe or ServerManager.subscribe.
+
+    Events are buffered up to maxsize, the oldest events are dropped if the consumer falls behind. Output events
+    carry the sequence number of their line, pass the last seen sequence number + 1 as since_seq to resume.
+    The subscription removes its callbacks when it is closed, use it as async context manager or call aclose.
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self.dropped = 0
+        self.cursor: Optional[int] = None
+        self._events: Deque[SubscriptionEvent] = deque()
+        self._waiter: Optional[asyncio.Future] = None
+        self._registrations: List[Tuple[Callback, Callable]] = []
+        self._closed = False
+
+    def attach(self, callback: Callback, handler: Callable[..., None]):
+        """
+        Install a function on a callback which is removed again when the subscription closes.
+        The callback only keeps a weak reference to the subscription, so it is also closed when it is garbage collected.
+        :param callback: The callback to listen on
+        :param handler: Plain function called with the subscription and the arguments of the callback
+        """
+        ref = weakref.ref(self)
+
+        def forward(*args):
+            subscription = ref()
+            if subscription is not None:
+                handler(subscription, *args)
+
+        callback.add_callback(forward)
+        self._registrations.append((callback, forward))
+
+    def put(self, event: SubscriptionEvent):
+        if self._closed:
+            return
+        if len(self._events) >= self.maxsize:
+            self._events.popleft()
+            self.dropped += 1
+        self._events.append(event)
+        if event.seq is not None:
+            self.cursor = event.seq + 1
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> SubscriptionEvent:
+        while not self._events:
+            if self._closed:
+                raise StopAsyncIteration
+            self._waiter = asyncio.get_event_loop().create_future()
+            await self._waiter
+        return self._events.popleft()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        for callback, handler in self._registrations:
+            callback.remove_callback(handler)
+        self._registrations = []
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    async def aclose(self):
+        self.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __del__(self):
+        self.close()
@@ -0,0 +1,96 @@
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Optional, Tuple
+
+from mc_server_interaction.interaction.log_events import ServerEvent, ServerEventType
+
+
+@dataclass
+class TickStats:
+    tps: Optional[float]
+    mspt: Optional[float]
+    skipped_ticks: int
+    behind_ms: int
+    # "measured" if tps or mspt were reported by the server, "estimated" if derived from lag warnings
+    source: str
+
+
+class TickTelemetry:
+    """
+    Tick health of a server. TPS and MSPT are taken from the output of the tick query command (vanilla 1.20.3+)
+    or the tps command of bukkit servers. Without recent measurements TPS is estimated from the ticks skipped
+    according to the "Can't keep up!" warnings within the last window seconds.
+    """
+
+    def __init__(self, window: float = 60, max_age: float = 90):
+        """
+        :param window: Seconds of lag warnings used to estimate TPS
+        :param max_age: Seconds a measurement is preferred over the estimate
+        """
+        self.window = window
+        self.max_age = max_age
+        self.reset()
+
+    def reset(self):
+        self.tick_rate = 20.0
+        self.skipped_ticks = 0
+        self.behind_ms = 0
+        self._lag: Deque[Tuple[float, int]] = deque()
+        self._tps: Optional[float] = None
+        self._mspt: Optional[float] = None
+        self._measured_at: Optional[float] = None
+
+    def handle(self, event: ServerEvent) -> bool:
+        """
+        :return: True if the event was a tick related event
+        """
+        now = time.monotonic()
+        if event.type == ServerEventType.LAG:
+            self.skipped_ticks += event.data["skipped_ticks"]
+            self.behind_ms = event.data["behind_ms"]
+            self._lag.append((now, event.data["skipped_ticks"]))
+            return True
+        if event.type != ServerEventType.TICK_STATS:
+            return False
+        if "tick_rate" in event.data:
+            self.tick_rate = event.data["tick_rate"]
+        if "mspt" in event.data:
+            self._mspt = event.data["mspt"]
+            # the tick rate is capped, faster ticks only mean more idle time
+            self._tps = min(self.tick_rate, 1000 / self._mspt) if self._mspt > 0 else self.tick_rate
+            self._measured_at = now
+        if "tps" in event.data:
+            self._tps = min(self.tick_rate, event.data["tps"])
+            self._measured_at = now
+        return True
+
+    @property
+    def is_measured(self) -> bool:
+        return self._measured_at is not None and time.monotonic() - self._measured_at <= self.max_age
+
+    @property
+    def tps(self) -> float:
+        if self.is_measured:
+            return self._tps
+        return self.estimate_tps()
+
+    @property
+    def mspt(self) -> Optional[float]:
+        return self._mspt if self.is_measured else None
+
+    def estimate_tps(self) -> float:
+        start = time.monotonic() - self.window
+        while self._lag and self._lag[0][0] < start:
+            self._lag.popleft()
+        skipped = sum(ticks for _, ticks in self._lag)
+        return max(0.0, self.tick_rate - skipped / self.window)
+
+    def stats(self) -> TickStats:
+        return TickStats(
+            round(self.tps, 2),
+            self.mspt,
+            self.skipped_ticks,
+            self.behind_ms,
+            "measured" if self.is_measured else "estimated",
+        )
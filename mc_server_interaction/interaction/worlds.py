@@ -1,10 +1,15 @@
+import asyncio
 import json
+import os
 import shutil
+import uuid
 from logging import getLogger
 from pathlib import Path
+from typing import Awaitable, Callable, Optional, Tuple
 
 from mc_server_interaction.exceptions import NotAWorldFolderException
-from mc_server_interaction.utils.files import async_copytree
+from mc_server_interaction.utils.archive import ArchiveCodec, ProgressCallback, create_archive, extract_archive
+from mc_server_interaction.utils.files import async_copytree, async_synctree, exchange_paths
 
 
 class MinecraftWorld:
@@ -55,21 +60,92 @@ class MinecraftWorld:
                     if type(data.get("DataVersion")) is int:
                         break
 
-    def backup(self, target_path: str):
-        self.logger.info(f"Creating backup to path {target_path}")
-        shutil.make_archive(
-            target_path, "zip",
-            str(self.path)
+    async def backup(
+            self,
+            target_path: str,
+            codec: str = ArchiveCodec.ZIP,
+            progress_callback: Optional[ProgressCallback] = None,
+            cancel_event: Optional[asyncio.Event] = None,
+    ) -> Path:
+        """
+        Archive the world without blocking the event loop.
+        :param target_path: Path of the archive without file extension
+        :param codec: One of ArchiveCodec
+        :param progress_callback: Called with bytes done and total bytes
+        :param cancel_event: Cancels the backup when set
+        :return: Path of the created archive
+        """
+        archive_path = Path(f"{target_path}.{codec}")
+        self.logger.info(f"Creating backup to path {archive_path}")
+        await create_archive(self.path, archive_path, codec, progress_callback, cancel_event)
+        return archive_path
+
+    async def incremental_backup(
+            self, store, bid: str, parent: Optional[str] = None, region_aware: bool = False
+    ) -> Tuple[int, int]:
+        """
+        :return: The size of the world and the number of bytes newly written to the store
+        """
+        self.logger.info(f"Creating incremental backup {bid}")
+        return await asyncio.get_running_loop().run_in_executor(
+            None, store.create_snapshot, bid, self.path, parent, region_aware
         )
 
-    def restore_backup(self, zip_path):
-        self.logger.info(f"Restoring backup from {zip_path}")
-        if self.path.is_dir():
-            shutil.rmtree(str(self.path))
+    async def restore_incremental_backup(self, store, bid: str):
+        self.logger.info(f"Restoring incremental backup {bid}")
+        loop = asyncio.get_running_loop()
+        await self._restore_staged(lambda staging: loop.run_in_executor(None, store.restore_snapshot, bid, staging))
+        self.logger.info("Incremental backup restored")
+
+    async def snapshot(self, destination: Path):
+        """
+        Copy the world files to destination, keeping their modification times.
+        If destination already holds a snapshot, only files changed since then are copied.
+        """
+        if destination.is_dir():
+            self.logger.info(f"Updating snapshot in {destination}")
+            await async_synctree(self.path, destination)
+        else:
+            self.logger.info(f"Creating snapshot in {destination}")
+            await async_copytree(self.path, destination, preserve_metadata=True)
 
-        shutil.unpack_archive(zip_path, self.path, "zip")
+    async def restore_backup(
+            self,
+            archive_path: Path,
+            progress_callback: Optional[ProgressCallback] = None,
+            cancel_event: Optional[asyncio.Event] = None,
+    ):
+        self.logger.info(f"Restoring backup from {archive_path}")
+        await self._restore_staged(
+            lambda staging: extract_archive(
+                archive_path, staging, progress_callback=progress_callback, cancel_event=cancel_event
+            )
+        )
         self.logger.info("Backup archive unpacked")
 
+    async def _restore_staged(self, restore: Callable[[Path], Awaitable]):
+        """
+        Restore into a staging directory next to the world and swap it in once restoring succeeded.
+        The live world stays untouched if restoring fails. The replaced world is deleted in the background.
+        :param restore: Coroutine function which restores the world into the given directory
+        """
+        loop = asyncio.get_running_loop()
+        staging = self.path.with_name(f".{self.name}.restore-{uuid.uuid4().hex}")
+        try:
+            await restore(staging)
+        except BaseException:
+            self.logger.error("Restoring failed, keeping current world")
+            await loop.run_in_executor(None, shutil.rmtree, str(staging), True)
+            raise
+
+        if self.path.is_dir():
+            exchange_paths(self.path, staging)
+            self.logger.debug(f"Deleting replaced world files in {staging}")
+            cleanup = loop.run_in_executor(None, shutil.rmtree, str(staging), True)
+            cleanup.add_done_callback(lambda _: self.logger.debug("Replaced world files deleted"))
+        else:
+            os.rename(staging, self.path)
+
     async def copy_to(self, destination: Path, override: bool = False):
         self.logger.debug(f"Copying world to path {destination}")
         if not self.exists():
@@ -0,0 +1,94 @@
+import asyncio
+import time
+from logging import getLogger
+from typing import Dict
+
+import psutil
+
+from mc_server_interaction.exceptions import InsufficientMemoryException
+from mc_server_interaction.interaction import MinecraftServer
+from mc_server_interaction.interaction.models import ServerStatus
+
+_MIB = 1024 * 1024
+
+
+class AdmissionController:
+    """
+    Decides when a server may start. A server is only started when the memory of all running servers, counted as
+    their configured ram plus JVM overhead, still fits into the system memory next to the memory used by other
+    processes. Starts which do not fit wait in order until a server stops, and consecutive starts are spread by
+    stagger seconds so the JVM warmups do not compete for the CPU.
+    """
+
+    # heap times this factor, for metaspace, code cache, thread stacks and direct buffers of the JVM
+    jvm_overhead = 1.25
+    # MiB left for the system
+    reserved_memory = 1024
+    # seconds between two starts
+    stagger = 5
+    # seconds after which the memory is checked again while waiting for a server to stop
+    recheck_interval = 10
+
+    def __init__(self, servers: Dict[str, MinecraftServer]):
+        self.logger = getLogger(f"MCServerInteraction.{self.__class__.__name__}")
+        self.servers = servers
+        self._lock = asyncio.Lock()
+        self._last_start = 0.0
+
+    def required_memory(self, server: MinecraftServer) -> int:
+        """
+        :return: Memory in MiB the server is expected to use
+        """
+        return int(server.server_config.ram * self.jvm_overhead)
+
+    def committed_memory(self) -> int:
+        """
+        :return: Memory in MiB reserved for all running servers
+        """
+        return sum(self.required_memory(server) for server in self.servers.values() if server.is_running)
+
+    def free_memory(self) -> int:
+        """
+        :return: Memory in MiB which can be reserved for another server
+        """
+        memory = psutil.virtual_memory()
+        used_by_servers = sum(
+            server.system_load["memory"]["server"] for server in self.servers.values() if server.is_running
+        )
+        used_by_others = max(0, memory.total - memory.available - used_by_servers) // _MIB
+        return memory.total // _MIB - used_by_others - self.reserved_memory - self.committed_memory()
+
+    async def start(self, server: MinecraftServer):
+        """
+        Start the server as soon as there is enough memory and the previous start was stagger seconds ago.
+        Raises InsufficientMemoryException if the server does not fit even without other servers running.
+        """
+        required = self.required_memory(server)
+        async with self._lock:
+            while True:
+                free = self.free_memory()
+                if required <= free:
+                    break
+                # the memory available with all other servers stopped
+                capacity = free + self.committed_memory()
+                if required > capacity:
+                    raise InsufficientMemoryException(
+                        f"{server.name} needs {required} MiB, at most {capacity} MiB are available"
+                    )
+                self.logger.info(f"Waiting for memory to start {server.name}, {required} MiB required")
+                await self._wait_for_stop([s for s in self.servers.values() if s.is_running])
+            delay = self._last_start + self.stagger - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                await server.start()
+            finally:
+                self._last_start = time.monotonic()
+
+    async def _wait_for_stop(self, servers: list):
+        waiters = [asyncio.ensure_future(server.wait_until(ServerStatus.STOPPED)) for server in servers]
+        try:
+            await asyncio.wait(waiters, timeout=self.recheck_interval, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
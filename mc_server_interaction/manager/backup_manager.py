@@ -1,16 +1,23 @@
+import asyncio
 import json
 import os
+import shutil
 import uuid
 from dataclasses import dataclass
 from datetime import datetime
 from logging import getLogger
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Optional
 
 import aiofiles
 
 from mc_server_interaction.interaction import MinecraftServer
+from mc_server_interaction.interaction.log_events import ServerEventType
+from mc_server_interaction.interaction.worlds import MinecraftWorld
 from mc_server_interaction.paths import backup_dir, data_dir
+from mc_server_interaction.utils.archive import ProgressCallback
+from .backup_store import BackupStore
+from .models import BackupFormat
 
 
 @dataclass
@@ -20,7 +27,11 @@ class Backup:
     world: str
     version: str
     path: str
+    # size of the backed up world for incremental backups, of the archive otherwise
     size: int = 0
+    format: str = BackupFormat.ZIP
+    # bytes the backup added to the disk usage, less than size if an incremental backup shares data
+    new_bytes: int = 0
 
     @property
     def __dict__(self):
@@ -30,7 +41,9 @@ class Backup:
             "world": self.world,
             "version": self.version,
             "path": self.path,
-            "size": self.size
+            "size": self.size,
+            "format": self.format,
+            "new_bytes": self.new_bytes,
         }
 
     @classmethod
@@ -41,7 +54,9 @@ class Backup:
             world=data["world"],
             version=data["version"],
             path=data["path"],
-            size=data.get("size", 0)
+            size=data.get("size", 0),
+            format=data.get("format", BackupFormat.ZIP),
+            new_bytes=data.get("new_bytes", data.get("size", 0)),
         )
 
 
@@ -52,6 +67,7 @@ class BackupManager:
         self.logger = getLogger(f"MCServerInteraction.{self.__class__.__name__}")
         self.servers = servers
         self.backups: Dict[str, Backup] = {}
+        self.store = BackupStore()
         self.load_backups()
 
     def load_backups(self):
@@ -77,25 +93,99 @@ class BackupManager:
                 f, indent=4,
             )
 
-    async def create_backup(self, sid: str, world_name):
+    async def create_backup(
+            self,
+            sid: str,
+            world_name,
+            backup_format: str = BackupFormat.ZIP,
+            hot: bool = False,
+            progress_callback: Optional[ProgressCallback] = None,
+    ):
+        """
+        Create a backup of a world. Stops the server if the world is currently in use, unless hot is set.
+        :param sid: The sid of the server
+        :param world_name: The name of the world
+        :param backup_format: BackupFormat.ZIP, BackupFormat.TAR or BackupFormat.TAR_ZSTD for a full archive,
+        BackupFormat.INCREMENTAL to store only
+        data that changed since the last incremental backup or BackupFormat.REGION_DELTA to additionally store
+        only the changed chunks of region files
+        :param hot: Back up a world in use without stopping the server. The world is copied to a temporary
+        snapshot, saving is only paused while files changed during that copy are copied again. The backup is then
+        created from the snapshot.
+        :param progress_callback: Called with bytes done and total bytes while an archive is written
+        """
         server = self.servers[sid]
+        world = server.get_world(world_name)
+        bid = str(uuid.uuid4().hex)
+        snapshot_path = None
         if server.is_running and server.active_world.name == world_name:
-            self.logger.info("Stopping server to create backup")
-            await server.shutdown()
+            if hot and server.is_online:
+                snapshot_path = backup_dir / "snapshots" / bid
+                await self._create_hot_snapshot(server, world, snapshot_path)
+                world = MinecraftWorld(snapshot_path, server_name=server.name)
+            else:
+                self.logger.info("Stopping server to create backup")
+                await server.shutdown()
 
         self.logger.info(f"Creating backup for {sid}: {world_name}")
-        world = server.get_world(world_name)
-        bid = str(uuid.uuid4().hex)
-        file_name = str(backup_dir / f"{str(bid)}.zip")
-        world.backup(str(backup_dir / bid))
-        size = Path(file_name).stat().st_size
+        try:
+            await self._create_backup(sid, world, world_name, bid, backup_format, progress_callback)
+        finally:
+            if snapshot_path is not None:
+                shutil.rmtree(str(snapshot_path), ignore_errors=True)
+
+    async def _create_backup(
+            self,
+            sid: str,
+            world: MinecraftWorld,
+            world_name: str,
+            bid: str,
+            backup_format: str,
+            progress_callback: Optional[ProgressCallback],
+    ):
+        if backup_format in (BackupFormat.INCREMENTAL, BackupFormat.REGION_DELTA):
+            parent = self.get_latest_backup(sid, world_name, backup_format)
+            size, new_bytes = await world.incremental_backup(
+                self.store, bid, parent, region_aware=backup_format == BackupFormat.REGION_DELTA
+            )
+            file_name = str(self.store.manifest_path(bid))
+        else:
+            archive_path = await world.backup(str(backup_dir / bid), backup_format, progress_callback)
+            file_name = str(archive_path)
+            size = new_bytes = archive_path.stat().st_size
 
         self.backups[bid] = Backup(
-            sid, datetime.now(), world_name, server.server_config.version, file_name, size
+            sid, datetime.now(), world_name, self.servers[sid].server_config.version, file_name, size, backup_format,
+            new_bytes,
         )
         self.save_backup_file()
 
-    async def restore_backup(self, bid):
+    @staticmethod
+    async def _create_hot_snapshot(
+            server: MinecraftServer, world: MinecraftWorld, snapshot_path: Path, timeout: int = 300
+    ):
+        """
+        Copy the world of a running server to snapshot_path. The world is copied while the server keeps saving,
+        then saving is paused and only the files written since the first copy are copied again.
+        Region files are rewritten in place, so they cannot be hardlinked and changed ones are still copied
+        while saving is paused. The pause grows with the amount of changed regions, not with the world size.
+        """
+        snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+        await world.snapshot(snapshot_path)
+
+        server.logger.info("Pausing world saving for hot backup")
+        saved = server.expect_event(ServerEventType.SAVED)
+        await server.send_command("save-off")
+        try:
+            await server.send_command("save-all flush")
+            await asyncio.wait_for(saved, timeout)
+            await world.snapshot(snapshot_path)
+        finally:
+            saved.cancel()
+            await server.send_command("save-on")
+            server.logger.info("World saving resumed")
+
+    async def restore_backup(self, bid, progress_callback: Optional[ProgressCallback] = None):
         # throws key error
         backup = self.backups[bid]
         server = self.servers[backup.sid]
@@ -111,7 +201,10 @@ class BackupManager:
             await server.shutdown()
             restart = True
 
-        world.restore_backup(backup_dir / f"{bid}.zip")
+        if backup.format in (BackupFormat.INCREMENTAL, BackupFormat.REGION_DELTA):
+            await world.restore_incremental_backup(self.store, bid)
+        else:
+            await world.restore_backup(Path(backup.path), progress_callback)
         if restart:
             await server.start()
 
@@ -120,12 +213,24 @@ class BackupManager:
         if backup is None:
             return
 
-        os.remove(backup.path)
+        if backup.format in (BackupFormat.INCREMENTAL, BackupFormat.REGION_DELTA):
+            self.store.delete_snapshot(bid)
+        else:
+            os.remove(backup.path)
         self.save_backup_file()
 
     def get_backup(self, bid: str):
         return self.backups.get(bid, None)
 
+    def get_latest_backup(self, sid: str, world_name: str, backup_format: str) -> Optional[str]:
+        backups = [
+            (backup.time, bid) for bid, backup in self.backups.items()
+            if backup.sid == sid and backup.world == world_name and backup.format == backup_format
+        ]
+        if not backups:
+            return None
+        return max(backups)[1]
+
     def get_backups_for_server(self, sid: str):
         return {
             bid: backup for bid, backup in self.backups.items() if sid == backup.sid
@@ -0,0 +1,319 @@
+import hashlib
+import json
+import os
+import threading
+import uuid
+from logging import getLogger
+from pathlib import Path
+from typing import Dict, Optional, Set, Tuple
+
+from mc_server_interaction.paths import backup_dir
+from mc_server_interaction.utils.anvil import is_region_file, read_region_chunks, write_region_file
+
+
+class BackupStore:
+    """
+    Content addressed object store for incremental backups.
+
+    Files are split into fixed size chunks which are stored once under their sha256 digest, so identical data is
+    shared between all backups, worlds and servers. Every backup is described by a manifest listing the chunks of
+    each file. Chunks are reference counted per manifest and removed once no manifest uses them anymore.
+
+    In region aware mode Anvil region files are not split into fixed size chunks but into their Minecraft chunks,
+    so a region file in which a single chunk changed only adds that chunk to the store.
+
+    The store is thread safe. Objects which become unreferenced while a snapshot is created are only removed once
+    no snapshot is in progress anymore, a running snapshot may already reuse them.
+    """
+    chunk_size = 4 * 1024 * 1024
+
+    def __init__(self, path: Path = backup_dir / "store"):
+        self.logger = getLogger(f"MCServerInteraction.{self.__class__.__name__}")
+        self.path = path
+        self.objects_dir = path / "objects"
+        self.manifests_dir = path / "manifests"
+        self.refcount_file = path / "refcounts.json"
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.manifests_dir.mkdir(parents=True, exist_ok=True)
+        self.refcounts: Dict[str, int] = {}
+        self._lock = threading.RLock()
+        self._active_snapshots = 0
+        self._deferred_removals: Set[str] = set()
+        self.load_refcounts()
+
+    def load_refcounts(self):
+        with self._lock:
+            try:
+                with open(self.refcount_file, "r") as f:
+                    self.refcounts = json.load(f)
+            except (json.decoder.JSONDecodeError, FileNotFoundError):
+                self.logger.info("No valid refcount file found, rebuilding from manifests")
+                self.rebuild_refcounts()
+
+    def save_refcounts(self):
+        with self._lock:
+            temp_file = self._temp_path(self.refcount_file)
+            with open(temp_file, "w") as f:
+                json.dump(self.refcounts, f)
+            os.replace(temp_file, self.refcount_file)
+
+    def rebuild_refcounts(self):
+        with self._lock:
+            self.refcounts = {}
+            for manifest_file in self.manifests_dir.glob("*.json"):
+                with open(manifest_file, "r") as f:
+                    manifest = json.load(f)
+                for digest in self._manifest_digests(manifest):
+                    self.refcounts[digest] = self.refcounts.get(digest, 0) + 1
+            self.save_refcounts()
+
+    def manifest_path(self, bid: str) -> Path:
+        return self.manifests_dir / f"{bid}.json"
+
+    def object_path(self, digest: str) -> Path:
+        return self.objects_dir / digest[:2] / digest[2:]
+
+    def has_manifest(self, bid: str) -> bool:
+        return self.manifest_path(bid).is_file()
+
+    def load_manifest(self, bid: str) -> dict:
+        with open(self.manifest_path(bid), "r") as f:
+            return json.load(f)
+
+    def put_object(self, data: bytes) -> Tuple[str, int]:
+        """
+        Store data under its digest if it is not stored yet.
+        :return: The digest and the number of bytes written
+        """
+        return self._put_object(data, hashlib.sha256(data).hexdigest())
+
+    def _put_object(self, data: bytes, digest: str) -> Tuple[str, int]:
+        path = self.object_path(digest)
+        if path.is_file():
+            return digest, 0
+        path.parent.mkdir(exist_ok=True)
+        temp_path = self._temp_path(path)
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        return digest, len(data)
+
+    def get_object(self, digest: str) -> bytes:
+        with open(self.object_path(digest), "rb") as f:
+            return f.read()
+
+    def create_snapshot(
+            self, bid: str, source: Path, parent: Optional[str] = None, region_aware: bool = False
+    ) -> Tuple[int, int]:
+        """
+        Store all files of a directory and write the manifest for the backup.
+        Files whose size and modification time match the parent backup are not read again.
+        :param bid: The id of the backup
+        :param source: The directory to back up
+        :param parent: Id of a previous backup of the same directory
+        :param region_aware: Store region files chunk by chunk, skipping chunks unchanged since the parent backup
+        :return: The total size of the backed up files and the number of bytes newly written to the store
+        """
+        with self._lock:
+            self._active_snapshots += 1
+        try:
+            parent_files = {}
+            with self._lock:
+                if parent is not None and self.has_manifest(parent):
+                    parent_files = {entry["path"]: entry for entry in self.load_manifest(parent)["files"]}
+            return self._create_snapshot(bid, source, parent, parent_files, region_aware)
+        finally:
+            with self._lock:
+                self._end_snapshot()
+
+    def _create_snapshot(
+            self, bid: str, source: Path, parent: Optional[str], parent_files: Dict[str, dict], region_aware: bool
+    ) -> Tuple[int, int]:
+        self.logger.info(f"Creating snapshot {bid} of {source}")
+        written = 0
+        files = []
+        for root, dirs, file_names in os.walk(source):
+            dirs.sort()
+            for file_name in sorted(file_names):
+                file_path = Path(root) / file_name
+                rel_path = file_path.relative_to(source).as_posix()
+                stat = file_path.stat()
+                parent_entry = parent_files.get(rel_path)
+                if (
+                        parent_entry is not None
+                        and parent_entry["size"] == stat.st_size
+                        and parent_entry["mtime_ns"] == stat.st_mtime_ns
+                ):
+                    files.append(parent_entry)
+                    continue
+                if region_aware and is_region_file(file_path):
+                    entry, new_bytes = self._store_region_file(file_path, rel_path, stat, parent_entry)
+                else:
+                    entry, new_bytes = self._store_file(file_path, rel_path, stat)
+                written += new_bytes
+                files.append(entry)
+
+        manifest = {"version": 1, "parent": parent, "files": files}
+        self._write_manifest(bid, manifest)
+        size = sum(entry["size"] for entry in files)
+        self.logger.info(f"Snapshot {bid} created, {len(files)} files, {size} bytes, {written} new bytes")
+        return size, written
+
+    def restore_snapshot(self, bid: str, target: Path):
+        self.logger.info(f"Restoring snapshot {bid} to {target}")
+        manifest = self.load_manifest(bid)
+        target.mkdir(parents=True, exist_ok=True)
+        for entry in manifest["files"]:
+            file_path = target / entry["path"]
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(file_path, "wb") as f:
+                if entry.get("type") == "region":
+                    write_region_file(f, [
+                        (index, timestamp, self.get_object(digest))
+                        for index, timestamp, _, digest in entry["region"]
+                    ])
+                else:
+                    for digest in entry["chunks"]:
+                        f.write(self.get_object(digest))
+            os.utime(file_path, ns=(entry["mtime_ns"], entry["mtime_ns"]))
+
+    def snapshot_size(self, bid: str) -> int:
+        return sum(entry["size"] for entry in self.load_manifest(bid)["files"])
+
+    def delete_snapshot(self, bid: str):
+        """
+        Delete a manifest and all objects which are no longer referenced by any other manifest.
+        """
+        with self._lock:
+            if not self.has_manifest(bid):
+                self.logger.warning(f"Snapshot {bid} does not exist")
+                return
+            manifest = self.load_manifest(bid)
+            os.remove(self.manifest_path(bid))
+            unreferenced = set()
+            for digest in self._manifest_digests(manifest):
+                count = self.refcounts.get(digest, 0) - 1
+                if count > 0:
+                    self.refcounts[digest] = count
+                    continue
+                self.refcounts.pop(digest, None)
+                unreferenced.add(digest)
+            self.save_refcounts()
+            removed = self._remove_objects(unreferenced)
+        self.logger.info(f"Snapshot {bid} deleted, {removed} objects removed")
+
+    def collect_garbage(self):
+        """
+        Rebuild reference counts from the manifests and remove every unreferenced object.
+        """
+        with self._lock:
+            self.rebuild_refcounts()
+            unreferenced = set()
+            for object_dir in self.objects_dir.iterdir():
+                for object_file in object_dir.iterdir():
+                    digest = object_dir.name + object_file.name
+                    if digest not in self.refcounts and not object_file.name.endswith(".tmp"):
+                        unreferenced.add(digest)
+            removed = self._remove_objects(unreferenced)
+        self.logger.info(f"Garbage collection removed {removed} objects")
+
+    def _remove_objects(self, digests: Set[str]) -> int:
+        """
+        Remove unreferenced objects, or remember them until no snapshot is in progress. Needs the lock.
+        :return: The number of removed objects
+        """
+        if self._active_snapshots > 0:
+            self._deferred_removals.update(digests)
+            return 0
+        removed = 0
+        for digest in digests:
+            try:
+                os.remove(self.object_path(digest))
+                removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+    def _end_snapshot(self):
+        self._active_snapshots -= 1
+        if self._active_snapshots > 0 or not self._deferred_removals:
+            return
+        unreferenced = {digest for digest in self._deferred_removals if digest not in self.refcounts}
+        self._deferred_removals.clear()
+        removed = self._remove_objects(unreferenced)
+        self.logger.debug(f"Removed {removed} objects unreferenced while snapshots were created")
+
+    def _store_file(self, file_path: Path, rel_path: str, stat: os.stat_result):
+        chunks = []
+        written = 0
+        with open(file_path, "rb") as f:
+            while True:
+                data = f.read(self.chunk_size)
+                if not data:
+                    break
+                digest, new_bytes = self.put_object(data)
+                chunks.append(digest)
+                written += new_bytes
+        entry = {
+            "path": rel_path,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "chunks": chunks,
+        }
+        return entry, written
+
+    def _store_region_file(self, file_path: Path, rel_path: str, stat: os.stat_result, parent_entry: Optional[dict]):
+        parent_chunks = {}
+        if parent_entry is not None and parent_entry.get("type") == "region":
+            parent_chunks = {
+                index: (timestamp, length, digest) for index, timestamp, length, digest in parent_entry["region"]
+            }
+
+        chunks = []
+        written = 0
+        reused = 0
+        for index, timestamp, data in read_region_chunks(file_path):
+            # the timestamp has a resolution of one second, a chunk saved twice within a second keeps it
+            digest = hashlib.sha256(data).hexdigest()
+            parent_chunk = parent_chunks.get(index)
+            if parent_chunk is not None and parent_chunk == (timestamp, len(data), digest):
+                chunks.append([index, timestamp, len(data), digest])
+                reused += 1
+                continue
+            digest, new_bytes = self._put_object(bytes(data), digest)
+            chunks.append([index, timestamp, len(data), digest])
+            written += new_bytes
+        self.logger.debug(f"Stored region file {rel_path}, {len(chunks) - reused} of {len(chunks)} chunks changed")
+        entry = {
+            "path": rel_path,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "type": "region",
+            "region": chunks,
+        }
+        return entry, written
+
+    def _write_manifest(self, bid: str, manifest: dict):
+        path = self.manifest_path(bid)
+        temp_path = self._temp_path(path)
+        with open(temp_path, "w") as f:
+            json.dump(manifest, f)
+        with self._lock:
+            os.replace(temp_path, path)
+            for digest in self._manifest_digests(manifest):
+                self.refcounts[digest] = self.refcounts.get(digest, 0) + 1
+            self.save_refcounts()
+
+    @staticmethod
+    def _temp_path(path: Path) -> Path:
+        return path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+
+    @staticmethod
+    def _manifest_digests(manifest: dict) -> Set[str]:
+        digests = set()
+        for entry in manifest["files"]:
+            if entry.get("type") == "region":
+                digests.update(digest for _, _, _, digest in entry["region"])
+            else:
+                digests.update(entry["chunks"])
+        return digests
@@ -1,6 +1,7 @@
 from dataclasses import dataclass
 
 from mc_server_interaction.utils import game_constants
+from mc_server_interaction.utils.archive import ArchiveCodec
 
 
 @dataclass
@@ -17,3 +18,11 @@ class WorldGenerationSettings:
                 ("generate-structures", self.generate_structures),
             ]
         )
+
+
+class BackupFormat:
+    ZIP = ArchiveCodec.ZIP
+    TAR = ArchiveCodec.TAR
+    TAR_ZSTD = ArchiveCodec.TAR_ZSTD
+    INCREMENTAL = "incremental"
+    REGION_DELTA = "region_delta"
@@ -4,20 +4,24 @@ import os
 import shutil
 import time
 from pathlib import Path
-from typing import Dict, Tuple, Optional
+from typing import Dict, Iterable, List, Tuple, Optional, Union
 
 import aiofiles
 import aiohttp
 
 from mc_server_interaction.exceptions import ServerRunningException
 from mc_server_interaction.interaction import MinecraftServer
+from .admission import AdmissionController
 from .backup_manager import BackupManager
 from .data_store import ManagerDataStore
 from .models import WorldGenerationSettings
 from .utils import AvailableMinecraftServerVersions
 from ..interaction.models import ServerConfig, ServerStatus
+from ..interaction.resource_sampler import ResourceSampler
+from ..interaction.subscription import Subscription
 from ..paths import cache_dir
-from ..utils.files import async_copy
+from ..utils.files import async_link_or_copy
+from ..utils.scheduler import Scheduler
 
 
 class ServerManager:
@@ -29,11 +33,14 @@ class ServerManager:
     def __init__(self):
         self.logger = logging.getLogger(f"MCServerInteraction.{self.__class__.__name__}")
         self.config = ManagerDataStore()
+        self.scheduler = Scheduler()
+        self.sampler = ResourceSampler(scheduler=self.scheduler)
         for sid, server_config in self.config.get_servers().items():
-            server = MinecraftServer(server_config)
+            server = MinecraftServer(server_config, self.scheduler, self.sampler)
             self._servers[sid] = server
 
         self.backup_manager = BackupManager(self._servers)
+        self.admission = AdmissionController(self._servers)
 
     async def stop_all_servers(self):
         self.logger.info("Stopping all running servers")
@@ -41,6 +48,96 @@ class ServerManager:
             *[server.shutdown() for server in self._servers.values() if server.is_running]
         )
 
+    async def start_servers(
+            self,
+            sids: Optional[Iterable[str]] = None,
+            max_concurrency: int = 2,
+            startup_timeout: float = 300,
+    ) -> Dict[str, Union[ServerStatus, Exception]]:
+        """
+        Start multiple servers. Starts are admitted by the admission controller, so servers which do not fit into
+        memory wait until other servers stopped.
+        :param sids: Servers to start, all installed servers which are not running if None
+        :param max_concurrency: Number of servers which may be starting up at the same time
+        :param startup_timeout: Seconds a server may take to start before the next one is started anyway
+        :return: Dictionary of sid: status after the startup or the exception which prevented the start
+        """
+        if sids is None:
+            sids = [
+                sid for sid, server in self._servers.items()
+                if server.status == ServerStatus.STOPPED and not server.is_running
+            ]
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def start(server: MinecraftServer):
+            async with semaphore:
+                await self.admission.start(server)
+                await self._wait_for_startup(server, startup_timeout)
+
+        return await self._run_for_servers(sids, start)
+
+    async def restart_servers(
+            self,
+            sids: Optional[Iterable[str]] = None,
+            max_concurrency: int = 2,
+            timeout: float = 120,
+            startup_timeout: float = 300,
+    ) -> Dict[str, Union[ServerStatus, Exception]]:
+        """
+        Restart multiple servers, at most max_concurrency of them are down at the same time.
+        :param sids: Servers to restart, all running servers if None
+        :param max_concurrency: Number of servers which may be restarting at the same time
+        :param timeout: Seconds to wait for a server to shut down before its process is killed
+        :param startup_timeout: Seconds a server may take to start before the next one is restarted anyway
+        :return: Dictionary of sid: status after the startup or the exception which prevented the restart
+        """
+        if sids is None:
+            sids = [sid for sid, server in self._servers.items() if server.is_running]
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def restart(server: MinecraftServer):
+            async with semaphore:
+                if server.is_running:
+                    await server.shutdown(timeout)
+                await self.admission.start(server)
+                await self._wait_for_startup(server, startup_timeout)
+
+        return await self._run_for_servers(sids, restart)
+
+    async def _run_for_servers(self, sids: Iterable[str], func) -> Dict[str, Union[ServerStatus, Exception]]:
+        async def run(sid: str):
+            # an unknown sid only fails its own entry
+            server = self._servers.get(sid)
+            if server is None:
+                raise KeyError(f"Unknown server {sid}")
+            await func(server)
+
+        sids = list(sids)
+        results: List[Union[None, Exception]] = await asyncio.gather(
+            *[run(sid) for sid in sids], return_exceptions=True
+        )
+        statuses = {}
+        for sid, result in zip(sids, results):
+            if isinstance(result, Exception):
+                server = self._servers.get(sid)
+                self.logger.error(f"Could not start server {server.name if server else sid}: {result!r}")
+                statuses[sid] = result
+            else:
+                statuses[sid] = self._servers[sid].status
+        return statuses
+
+    @staticmethod
+    async def _wait_for_startup(server: MinecraftServer, timeout: float):
+        waiters = [
+            asyncio.ensure_future(server.wait_until(ServerStatus.RUNNING)),
+            asyncio.ensure_future(server.wait_until(ServerStatus.STOPPED)),
+        ]
+        try:
+            await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+
     def get_servers(self) -> Dict[str, MinecraftServer]:
         """
         :return: Dictionary of sid: MinecraftServer
@@ -96,7 +193,7 @@ class ServerManager:
         )
         self.config.add_server(latest_sid, config)
 
-        server = MinecraftServer(config)
+        server = MinecraftServer(config, self.scheduler, self.sampler)
         await server.set_status(ServerStatus.NOT_INSTALLED)
         self._servers[latest_sid] = server
         self.config.save()
@@ -139,7 +236,7 @@ class ServerManager:
                 and not force_redownload
         ):
             self.logger.info(f"Using cached server jar for version {version}")
-            await async_copy(
+            await async_link_or_copy(
                 (cache_dir / f"minecraft_server_{version}.jar"),
                 Path(os.path.join(path, "server.jar")),
             )
@@ -149,12 +246,15 @@ class ServerManager:
             download_url = await self.available_versions.get_download_link(version)
             async with aiohttp.ClientSession() as session:
                 filename = cache_dir / f"minecraft_server_{version}.jar"
-                async with aiofiles.open(filename, "wb") as f:
+                # download to a new file, the cached jar may be hardlinked into other servers
+                temp_filename = cache_dir / f"minecraft_server_{version}.jar.part"
+                async with aiofiles.open(temp_filename, "wb") as f:
                     resp = await session.get(download_url)
                     async for chunk in resp.content.iter_chunked(10 * 1024):
                         await f.write(chunk)
+                os.replace(temp_filename, filename)
 
-                await async_copy(filename, Path(os.path.join(path, "server.jar")))
+                await async_link_or_copy(filename, Path(os.path.join(path, "server.jar")))
 
         await server.set_status(ServerStatus.STOPPED)
         server.server_config.installed = True
@@ -162,3 +262,26 @@ class ServerManager:
 
     def get_server(self, sid) -> MinecraftServer:
         return self._servers.get(sid)
+
+    def subscribe(
+            self,
+            kinds: Optional[Iterable[str]] = None,
+            sids: Optional[Iterable[str]] = None,
+            since_seq: Optional[Dict[str, int]] = None,
+            maxsize: int = 4096,
+    ) -> Subscription:
+        """
+        Subscribe to the events of multiple servers in one async iterator. Every event is tagged with the sid.
+        :param kinds: SubscriptionKind values to receive, all kinds if None
+        :param sids: Servers to subscribe to, all servers if None
+        :param since_seq: Dictionary of sid: sequence number to replay buffered output from
+        :param maxsize: Number of events to buffer, the oldest events are dropped if the consumer falls behind
+        :return: The subscription
+        """
+        if kinds is not None:
+            kinds = frozenset(kinds)
+        since_seq = since_seq or {}
+        subscription = Subscription(maxsize)
+        for sid in self._servers if sids is None else sids:
+            self._servers[sid].attach_subscription(subscription, kinds, since_seq.get(sid), sid)
+        return subscription
@@ -0,0 +1,62 @@
+import mmap
+import struct
+from pathlib import Path
+from typing import BinaryIO, Iterator, List, Tuple
+
+SECTOR_SIZE = 4096
+CHUNKS_PER_REGION = 1024
+HEADER_SIZE = 2 * SECTOR_SIZE
+
+
+def is_region_file(path: Path) -> bool:
+    return path.suffix in (".mca", ".mcr") and path.stat().st_size >= HEADER_SIZE
+
+
+def read_region_chunks(path: Path) -> Iterator[Tuple[int, int, memoryview]]:
+    """
+    Iterate over all chunks stored in an Anvil region file.
+    The file is memory mapped, so only the header and the chunks which are actually accessed are read from disk.
+    :return: Tuples of chunk index, timestamp and the raw chunk data including its length prefix
+    """
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        view = memoryview(mapped)
+        try:
+            locations = struct.unpack_from(f">{CHUNKS_PER_REGION}I", mapped, 0)
+            timestamps = struct.unpack_from(f">{CHUNKS_PER_REGION}I", mapped, SECTOR_SIZE)
+            for index in range(CHUNKS_PER_REGION):
+                offset = (locations[index] >> 8) * SECTOR_SIZE
+                if offset < HEADER_SIZE or offset + 4 > len(mapped):
+                    continue
+                length = struct.unpack_from(">I", mapped, offset)[0]
+                end = min(offset + 4 + length, len(mapped))
+                chunk = view[offset:end]
+                try:
+                    yield index, timestamps[index], chunk
+                finally:
+                    chunk.release()
+        finally:
+            view.release()
+
+
+def write_region_file(f: BinaryIO, chunks: List[Tuple[int, int, bytes]]):
+    """
+    Write a complete region file from raw chunks. Chunks are laid out sequentially after the header.
+    :param f: A file opened for binary writing
+    :param chunks: Tuples of chunk index, timestamp and raw chunk data as returned by read_region_chunks
+    """
+    locations = [0] * CHUNKS_PER_REGION
+    timestamps = [0] * CHUNKS_PER_REGION
+    sector = HEADER_SIZE // SECTOR_SIZE
+    for index, timestamp, data in chunks:
+        sectors = -(-len(data) // SECTOR_SIZE)
+        locations[index] = (sector << 8) | min(sectors, 255)
+        timestamps[index] = timestamp
+        sector += sectors
+
+    f.write(struct.pack(f">{CHUNKS_PER_REGION}I", *locations))
+    f.write(struct.pack(f">{CHUNKS_PER_REGION}I", *timestamps))
+    for _, _, data in chunks:
+        f.write(data)
+        padding = -len(data) % SECTOR_SIZE
+        if padding:
+            f.write(b"\0" * padding)
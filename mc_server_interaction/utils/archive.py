@@ -0,0 +1,452 @@
+import asyncio
+import inspect
+import logging
+import os
+import shutil
+import struct
+import tarfile
+import tempfile
+import threading
+import time
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Callable, List, Optional
+
+from mc_server_interaction.exceptions import UnsupportedCodecException
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger("MCServerInteraction.Archive")
+
+ProgressCallback = Callable[[int, int], None]
+
+READ_SIZE = 1024 * 1024
+SPOOL_SIZE = 32 * 1024 * 1024
+# upper bound for the memory held by spooled members which are compressed but not yet written
+MAX_PENDING_BYTES = 4 * SPOOL_SIZE
+ZIP64_LIMIT = (1 << 31) - 1
+ZIP64_MARKER = 0xFFFFFFFF
+ZIP_COUNT_LIMIT = 0xFFFF
+
+
+class ArchiveCodec:
+    ZIP = "zip"
+    TAR = "tar"
+    TAR_ZSTD = "tar.zst"
+
+
+def codec_from_path(path: Path) -> str:
+    name = path.name
+    for codec in (ArchiveCodec.TAR_ZSTD, ArchiveCodec.TAR, ArchiveCodec.ZIP):
+        if name.endswith(f".{codec}"):
+            return codec
+    raise UnsupportedCodecException(name)
+
+
+def _check_codec(codec: str):
+    if codec not in (ArchiveCodec.ZIP, ArchiveCodec.TAR, ArchiveCodec.TAR_ZSTD):
+        raise UnsupportedCodecException(codec)
+    if codec == ArchiveCodec.TAR_ZSTD and zstandard is None:
+        raise UnsupportedCodecException("zstandard is not installed, install mc_server_interaction[zstd]")
+
+
+@dataclass
+class _Member:
+    path: Path
+    arcname: str
+    stat: os.stat_result
+    is_dir: bool
+    crc: int = 0
+    compressed_size: int = 0
+    data: Optional[BinaryIO] = None
+
+
+class _ZipWriter:
+    """
+    Minimal zip writer for members that were deflated in parallel beforehand.
+    Zip64 extensions are only written where sizes or offsets require them.
+    """
+
+    def __init__(self, f: BinaryIO):
+        self.f = f
+        self.entries = []
+
+    @staticmethod
+    def compress(member: _Member) -> _Member:
+        if member.is_dir:
+            return member
+        spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+        compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+        crc = 0
+        with open(member.path, "rb") as f:
+            while True:
+                data = f.read(READ_SIZE)
+                if not data:
+                    break
+                crc = zlib.crc32(data, crc)
+                spool.write(compressor.compress(data))
+        spool.write(compressor.flush())
+        member.crc = crc
+        member.compressed_size = spool.tell()
+        spool.seek(0)
+        member.data = spool
+        return member
+
+    def write(self, member: _Member):
+        offset = self.f.tell()
+        name = member.arcname.encode("utf-8")
+        size = 0 if member.is_dir else member.stat.st_size
+        method = zipfile.ZIP_STORED if member.is_dir else zipfile.ZIP_DEFLATED
+        mtime = time.localtime(member.stat.st_mtime)
+        dos_time = (mtime.tm_hour << 11) | (mtime.tm_min << 5) | (mtime.tm_sec // 2)
+        dos_date = (max(mtime.tm_year - 1980, 0) << 9) | (mtime.tm_mon << 5) | mtime.tm_mday
+
+        zip64 = size >= ZIP64_LIMIT or member.compressed_size >= ZIP64_LIMIT
+        extra = struct.pack("<HHQQ", 1, 16, size, member.compressed_size) if zip64 else b""
+        self.f.write(struct.pack(
+            "<4s5H3L2H", b"PK\x03\x04", 45 if zip64 else 20, 0x800, method, dos_time, dos_date, member.crc,
+            ZIP64_MARKER if zip64 else member.compressed_size, ZIP64_MARKER if zip64 else size, len(name), len(extra)
+        ))
+        self.f.write(name)
+        self.f.write(extra)
+        if member.data is not None:
+            shutil.copyfileobj(member.data, self.f, READ_SIZE)
+            member.data.close()
+        self.entries.append((name, size, method, dos_time, dos_date, member, offset))
+
+    def close(self):
+        central_offset = self.f.tell()
+        for name, size, method, dos_time, dos_date, member, offset in self.entries:
+            extra_fields = []
+            compressed_size = member.compressed_size
+            if size >= ZIP64_LIMIT:
+                extra_fields.append(size)
+                size = ZIP64_MARKER
+            if compressed_size >= ZIP64_LIMIT:
+                extra_fields.append(compressed_size)
+                compressed_size = ZIP64_MARKER
+            if offset >= ZIP64_LIMIT:
+                extra_fields.append(offset)
+                offset = ZIP64_MARKER
+            extra = b""
+            if extra_fields:
+                extra = struct.pack(f"<HH{len(extra_fields)}Q", 1, 8 * len(extra_fields), *extra_fields)
+            external_attr = (member.stat.st_mode & 0xFFFF) << 16
+            if member.is_dir:
+                external_attr |= 0x10
+            self.f.write(struct.pack(
+                "<4s6H3L5H2L", b"PK\x01\x02", (3 << 8) | 45, 45 if extra else 20, 0x800, method, dos_time,
+                dos_date, member.crc, compressed_size, size, len(name), len(extra), 0, 0, 0, external_attr, offset
+            ))
+            self.f.write(name)
+            self.f.write(extra)
+        central_end = self.f.tell()
+        central_size = central_end - central_offset
+        count = len(self.entries)
+        if count >= ZIP_COUNT_LIMIT or central_offset >= ZIP64_LIMIT or central_size >= ZIP64_LIMIT:
+            self.f.write(struct.pack(
+                "<4sQ2H2L4Q", b"PK\x06\x06", 44, 45, 45, 0, 0, count, count, central_size, central_offset
+            ))
+            self.f.write(struct.pack("<4sLQL", b"PK\x06\x07", 0, central_end, 1))
+            count = min(count, ZIP_COUNT_LIMIT)
+            central_size = min(central_size, ZIP64_MARKER)
+            central_offset = ZIP64_MARKER
+        self.f.write(struct.pack(
+            "<4s4H2LH", b"PK\x05\x06", 0, 0, count, count, central_size, central_offset, 0
+        ))
+
+
+class _TarWriter:
+    """
+    Tar writer which optionally compresses every member into its own zstd frame. Concatenated frames form a
+    valid zstd stream, so members can be compressed in parallel and the result is a regular .tar.zst file.
+    """
+
+    def __init__(self, f: BinaryIO, compress: bool):
+        self.f = f
+        self.compress = compress
+
+    @staticmethod
+    def _header(member: _Member) -> bytes:
+        info = tarfile.TarInfo(member.arcname)
+        info.mtime = int(member.stat.st_mtime)
+        info.mode = member.stat.st_mode & 0o7777
+        if member.is_dir:
+            info.type = tarfile.DIRTYPE
+        else:
+            info.size = member.stat.st_size
+        return info.tobuf(format=tarfile.PAX_FORMAT)
+
+    def prepare(self, member: _Member) -> _Member:
+        if not self.compress:
+            return member
+        spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+        writer = zstandard.ZstdCompressor(level=3).stream_writer(spool, closefd=False)
+        self._write_member(member, writer)
+        writer.close()
+        member.compressed_size = spool.tell()
+        spool.seek(0)
+        member.data = spool
+        return member
+
+    def _write_member(self, member: _Member, f: BinaryIO):
+        f.write(self._header(member))
+        if member.is_dir:
+            return
+        with open(member.path, "rb") as source:
+            shutil.copyfileobj(source, f, READ_SIZE)
+        padding = -member.stat.st_size % tarfile.BLOCKSIZE
+        if padding:
+            f.write(b"\0" * padding)
+
+    def write(self, member: _Member):
+        if member.data is None:
+            self._write_member(member, self.f)
+            return
+        shutil.copyfileobj(member.data, self.f, READ_SIZE)
+        member.data.close()
+
+    def close(self):
+        end = b"\0" * (2 * tarfile.BLOCKSIZE)
+        if self.compress:
+            end = zstandard.ZstdCompressor(level=3).compress(end)
+        self.f.write(end)
+
+
+def _spooled_size(member: _Member) -> int:
+    """
+    Estimate of the memory a prepared member holds until it is written, spooled files roll over to disk.
+    """
+    return 0 if member.is_dir else min(member.stat.st_size, SPOOL_SIZE)
+
+
+def _collect_members(source: Path) -> List[_Member]:
+    members = []
+    for root, dirs, files in os.walk(source):
+        dirs.sort()
+        root_path = Path(root)
+        for name in dirs:
+            path = root_path / name
+            members.append(_Member(path, path.relative_to(source).as_posix() + "/", path.stat(), True))
+        for name in sorted(files):
+            path = root_path / name
+            members.append(_Member(path, path.relative_to(source).as_posix(), path.stat(), False))
+    return members
+
+
+async def _report_progress(progress_callback: Optional[ProgressCallback], done: int, total: int):
+    if progress_callback is None:
+        return
+    result = progress_callback(done, total)
+    if inspect.isawaitable(result):
+        await result
+
+
+def _check_cancelled(cancel_event: Optional[asyncio.Event]):
+    if cancel_event is not None and cancel_event.is_set():
+        raise asyncio.CancelledError()
+
+
+async def create_archive(
+        source: Path,
+        target: Path,
+        codec: str = ArchiveCodec.ZIP,
+        progress_callback: Optional[ProgressCallback] = None,
+        cancel_event: Optional[asyncio.Event] = None,
+        max_workers: Optional[int] = None,
+):
+    """
+    Archive a directory without blocking the event loop.
+    Members are compressed in parallel in a thread pool and written to the archive in order.
+    :param source: The directory to archive
+    :param target: Path of the archive file
+    :param codec: One of ArchiveCodec
+    :param progress_callback: Called with the number of bytes done and the total number of bytes after every member
+    :param cancel_event: Cancels the operation when set. Cancelling the calling task works as well
+    :param max_workers: Number of compression threads, defaults to the number of cpus
+    """
+    _check_codec(codec)
+    loop = asyncio.get_running_loop()
+    max_workers = max_workers or os.cpu_count() or 1
+    executor = ThreadPoolExecutor(max_workers=max_workers + 1, thread_name_prefix="archive")
+    temp_target = target.with_name(f"{target.name}.part")
+    f = open(temp_target, "wb")
+    pending = deque()
+    try:
+        members = await loop.run_in_executor(executor, _collect_members, source)
+        total = sum(member.stat.st_size for member in members if not member.is_dir)
+        logger.info(f"Archiving {len(members)} entries ({total} bytes) from {source} to {target}")
+        if codec == ArchiveCodec.ZIP:
+            writer = _ZipWriter(f)
+            prepare = writer.compress
+        else:
+            writer = _TarWriter(f, codec == ArchiveCodec.TAR_ZSTD)
+            prepare = writer.prepare
+
+        done = 0
+        pending_bytes = 0
+        members = iter(members)
+        member = next(members, None)
+        while True:
+            # always keep one member in flight, even if it alone exceeds the limit
+            while member is not None and len(pending) < 2 * max_workers and (
+                    not pending or pending_bytes + _spooled_size(member) <= MAX_PENDING_BYTES):
+                pending.append(loop.run_in_executor(executor, prepare, member))
+                pending_bytes += _spooled_size(member)
+                member = next(members, None)
+            if not pending:
+                break
+            prepared = await pending.popleft()
+            _check_cancelled(cancel_event)
+            await loop.run_in_executor(executor, writer.write, prepared)
+            pending_bytes -= _spooled_size(prepared)
+            if not prepared.is_dir:
+                done += prepared.stat.st_size
+                await _report_progress(progress_callback, done, total)
+
+        await loop.run_in_executor(executor, writer.close)
+        f.close()
+        os.replace(temp_target, target)
+        logger.info(f"Archive {target} created")
+    except BaseException:
+        for future in pending:
+            future.cancel()
+        f.close()
+        os.remove(temp_target)
+        raise
+    finally:
+        executor.shutdown(wait=False)
+
+
+class _ZipReader:
+    """
+    Opens the archive once per extraction thread, reading the central directory again for every member would make
+    extracting archives with many small files quadratic.
+    """
+
+    def __init__(self, archive: Path):
+        self.archive = archive
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._files: List[zipfile.ZipFile] = []
+
+    def extract(self, name: str, destination: Path):
+        zf = getattr(self._local, "zf", None)
+        if zf is None:
+            zf = zipfile.ZipFile(self.archive)
+            self._local.zf = zf
+            with self._lock:
+                self._files.append(zf)
+        zf.extract(name, destination)
+
+    def close(self):
+        with self._lock:
+            for zf in self._files:
+                zf.close()
+            self._files = []
+
+
+async def _extract_zip(
+        archive: Path,
+        destination: Path,
+        executor: ThreadPoolExecutor,
+        max_workers: int,
+        progress_callback: Optional[ProgressCallback],
+        cancel_event: Optional[asyncio.Event],
+):
+    loop = asyncio.get_running_loop()
+    with zipfile.ZipFile(archive) as zf:
+        infos = zf.infolist()
+    total = sum(info.file_size for info in infos)
+    done = 0
+    pending = deque()
+    reader = _ZipReader(archive)
+    try:
+        infos = iter(infos)
+        while True:
+            while len(pending) < 2 * max_workers:
+                info = next(infos, None)
+                if info is None:
+                    break
+                future = loop.run_in_executor(executor, reader.extract, info.filename, destination)
+                pending.append((future, info.file_size))
+            if not pending:
+                break
+            future, size = pending.popleft()
+            await future
+            _check_cancelled(cancel_event)
+            done += size
+            await _report_progress(progress_callback, done, total)
+    except BaseException:
+        for future, _ in pending:
+            future.cancel()
+        raise
+    finally:
+        reader.close()
+
+
+async def _extract_tar(
+        archive: Path,
+        destination: Path,
+        codec: str,
+        executor: ThreadPoolExecutor,
+        progress_callback: Optional[ProgressCallback],
+        cancel_event: Optional[asyncio.Event],
+):
+    loop = asyncio.get_running_loop()
+    total = archive.stat().st_size
+    with open(archive, "rb") as raw:
+        stream = raw
+        if codec == ArchiveCodec.TAR_ZSTD:
+            stream = zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True)
+        extract_kwargs = {"filter": "data"} if hasattr(tarfile, "data_filter") else {}
+        with tarfile.open(fileobj=stream, mode="r|") as tar:
+            def extract_next():
+                member = tar.next()
+                if member is None:
+                    return False
+                tar.extract(member, destination, **extract_kwargs)
+                return True
+
+            while await loop.run_in_executor(executor, extract_next):
+                _check_cancelled(cancel_event)
+                await _report_progress(progress_callback, raw.tell(), total)
+
+
+async def extract_archive(
+        archive: Path,
+        destination: Path,
+        codec: Optional[str] = None,
+        progress_callback: Optional[ProgressCallback] = None,
+        cancel_event: Optional[asyncio.Event] = None,
+        max_workers: Optional[int] = None,
+):
+    """
+    Extract an archive without blocking the event loop. Zip members are extracted in parallel.
+    :param archive: Path of the archive file
+    :param destination: Directory to extract into
+    :param codec: One of ArchiveCodec, detected from the file name if not given
+    :param progress_callback: Called with the number of bytes done and the total number of bytes after every member
+    :param cancel_event: Cancels the operation when set. Cancelling the calling task works as well
+    :param max_workers: Number of extraction threads for zip archives, defaults to the number of cpus
+    """
+    codec = codec or codec_from_path(archive)
+    _check_codec(codec)
+    max_workers = max_workers or os.cpu_count() or 1
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="archive")
+    logger.info(f"Extracting {archive} to {destination}")
+    try:
+        if codec == ArchiveCodec.ZIP:
+            await _extract_zip(archive, destination, executor, max_workers, progress_callback, cancel_event)
+        else:
+            await _extract_tar(archive, destination, codec, executor, progress_callback, cancel_event)
+    finally:
+        executor.shutdown(wait=False)
+    logger.info(f"Archive {archive} extracted")
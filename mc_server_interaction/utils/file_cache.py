@@ -0,0 +1,205 @@
+import asyncio
+import ctypes
+import ctypes.util
+import json
+import logging
+import os
+import struct
+import sys
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+FileVersion = Tuple[int, int]
+
+_IN_NONBLOCK = os.O_NONBLOCK
+_IN_CLOEXEC = 0o2000000
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_WATCH_MASK = (
+        _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+        | _IN_DELETE_SELF | _IN_MOVE_SELF
+)
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def read_json(path: str) -> Any:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class _InotifyWatcher:
+    """
+    Watches directories with inotify and reports the paths of changed files. Linux only.
+    """
+
+    def __init__(self, on_change: Callable[[Optional[str]], None]):
+        self.loop = asyncio.get_running_loop()
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._on_change = on_change
+        self._directories: Dict[int, str] = {}
+        self._watches: Dict[str, int] = {}
+        self.loop.add_reader(self._fd, self.read_events)
+
+    def watch(self, directory: str) -> bool:
+        if directory in self._watches:
+            return True
+        wd = self._add_watch(self._fd, os.fsencode(directory), _WATCH_MASK)
+        if wd < 0:
+            return False
+        self._watches[directory] = wd
+        self._directories[wd] = directory
+        return True
+
+    def close(self):
+        if not self.loop.is_closed():
+            self.loop.remove_reader(self._fd)
+        os.close(self._fd)
+
+    def read_events(self):
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return
+            self._handle_events(data)
+
+    def _handle_events(self, data: bytes):
+        pos = 0
+        while pos < len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, pos)
+            name = data[pos + _EVENT_HEADER.size:pos + _EVENT_HEADER.size + length].rstrip(b"\0")
+            pos += _EVENT_HEADER.size + length
+            if mask & _IN_Q_OVERFLOW:
+                self._on_change(None)
+                continue
+            directory = self._directories.get(wd)
+            if directory is None:
+                continue
+            if mask & (_IN_IGNORED | _IN_DELETE_SELF | _IN_MOVE_SELF):
+                # the directory itself is gone, forget everything below it
+                self._watches.pop(directory, None)
+                self._directories.pop(wd, None)
+                self._on_change(directory)
+            elif name:
+                self._on_change(os.path.join(directory, os.fsdecode(name)))
+
+
+class FileCache:
+    """
+    Caches the parsed content of files. An entry is keyed by the path and parser and is only parsed again when the
+    modification time or size of the file changed.
+    On Linux the directories of cached files are watched with inotify while an event loop is running. Cached entries
+    are then validated with a single non-blocking read of pending events for all files instead of a stat per file.
+    An event for a file drops its entries, so changes which keep modification time and size are noticed as well.
+    """
+
+    def __init__(self, use_inotify: bool = True):
+        self.logger = logging.getLogger(f"MCServerInteraction.{self.__class__.__name__}")
+        self.use_inotify = use_inotify and sys.platform.startswith("linux")
+        self._entries: Dict[Tuple[str, Callable], Tuple[Optional[FileVersion], Any]] = {}
+        self._trusted: Set[Tuple[str, Callable]] = set()
+        self._watcher: Optional[_InotifyWatcher] = None
+
+    def get(self, path: str, parser: Callable[[str], Any] = read_json, default: Any = None) -> Any:
+        """
+        :param path: Path of the file
+        :param parser: Function which parses the file at the given path
+        :param default: Returned if the file does not exist
+        :return: The parsed content, the same object as long as the file is not changed
+        """
+        path = os.path.abspath(path)
+        key = (path, parser)
+        if key in self._trusted and self._watcher_active():
+            # pick up changes which happened since the event loop last polled the watcher
+            self._watcher.read_events()
+            if key in self._trusted:
+                return self._entries[key][1]
+        watched = self._watch(os.path.dirname(path))
+        version = _file_version(path)
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != version:
+            value = default if version is None else parser(path)
+            self.logger.debug(f"Parsed {path}")
+            entry = (version, value)
+            self._entries[key] = entry
+        if watched:
+            # changes are reported by the watcher from now on, so the entry stays valid until then
+            self._trusted.add(key)
+        return entry[1]
+
+    def invalidate(self, path: Optional[str] = None):
+        """
+        Force the file at path, or all files if path is None, to be parsed again on the next access.
+        """
+        if path is None:
+            self._entries.clear()
+            self._trusted.clear()
+            return
+        path = os.path.abspath(path)
+        for key in [key for key in self._entries if key[0] == path]:
+            del self._entries[key]
+            self._trusted.discard(key)
+
+    def _watcher_active(self) -> bool:
+        """
+        Events are only read while the event loop of the watcher is running, drop it otherwise.
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if self._watcher is not None and self._watcher.loop is loop:
+            return True
+        if self._watcher is not None:
+            self._watcher.close()
+            self._watcher = None
+        self._trusted.clear()
+        return False
+
+    def _watch(self, directory: str) -> bool:
+        if not self.use_inotify:
+            return False
+        if not self._watcher_active():
+            try:
+                self._watcher = _InotifyWatcher(self._on_change)
+            except RuntimeError:
+                # no running event loop, try again on the next access
+                return False
+            except (OSError, AttributeError) as e:
+                self.logger.debug(f"inotify is not available, falling back to stat: {e}")
+                self.use_inotify = False
+                return False
+        return self._watcher.watch(directory)
+
+    def _on_change(self, path: Optional[str]):
+        if path is None:
+            # events were lost, any file may have changed
+            self.invalidate()
+            return
+        prefix = path + os.sep
+        for key in [key for key in self._entries if key[0] == path or key[0].startswith(prefix)]:
+            del self._entries[key]
+            self._trusted.discard(key)
+
+
+def _file_version(path: str) -> Optional[FileVersion]:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+file_cache = FileCache()
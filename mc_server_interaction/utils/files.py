@@ -1,29 +1,128 @@
+import asyncio
+import ctypes
+import ctypes.util
+import errno
 import logging
+import os
+import shutil
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import BinaryIO, List, Tuple
 
-import aiofiles
+if sys.platform != "win32":
+    import fcntl
 
 logger = logging.getLogger("MCServerInteraction.FileUtils")
 
+FICLONE = 0x40049409
+# errors meaning the fast path is not supported for these files, not that copying failed
+_UNSUPPORTED_ERRORS = (errno.EXDEV, errno.ENOSYS, errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.EBADF)
 
-async def async_copy(source: Path, dest: Path, chunk_size: int = 128 * 1024):
-    async def read_in_chunks(infile):
-        while True:
-            c = await infile.read(chunk_size)
-            if c:
-                yield c
-            else:
-                return
+copy_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="copy")
+
+
+def _reflink(source_file: BinaryIO, dest_file: BinaryIO) -> bool:
+    if sys.platform != "linux":
+        return False
+    try:
+        fcntl.ioctl(dest_file.fileno(), FICLONE, source_file.fileno())
+    except OSError as e:
+        if e.errno in _UNSUPPORTED_ERRORS + (errno.EPERM,):
+            return False
+        raise
+    return True
+
+
+def _copy_in_kernel(source_file: BinaryIO, dest_file: BinaryIO, size: int) -> bool:
+    if sys.platform != "linux":
+        return False
+    copy_functions = []
+    if hasattr(os, "copy_file_range"):
+        copy_functions.append(
+            lambda offset, count: os.copy_file_range(source_file.fileno(), dest_file.fileno(), count, offset, offset)
+        )
+    copy_functions.append(lambda offset, count: os.sendfile(dest_file.fileno(), source_file.fileno(), offset, count))
+
+    for copy_function in copy_functions:
+        offset = 0
+        try:
+            while offset < size:
+                copied = copy_function(offset, min(size - offset, 1 << 30))
+                if copied == 0:
+                    break
+                offset += copied
+        except OSError as e:
+            if offset == 0 and e.errno in _UNSUPPORTED_ERRORS:
+                continue
+            raise
+        return offset == size
+    return False
+
+
+def copy_file(source: Path, dest: Path, preserve_metadata: bool = False, chunk_size: int = 1024 * 1024):
+    """
+    Copy a file using the fastest available method: a reflink on filesystems supporting it, a copy inside the
+    kernel with copy_file_range or sendfile, or a regular buffered copy.
+    :param source: The file to copy
+    :param dest: The destination file
+    :param preserve_metadata: Also copy permissions and modification times
+    :param chunk_size: Buffer size for the buffered copy
+    """
+    size = source.stat().st_size
+    with open(source, "rb") as source_file, open(dest, "wb") as dest_file:
+        if not _reflink(source_file, dest_file) and not _copy_in_kernel(source_file, dest_file, size):
+            source_file.seek(0)
+            dest_file.seek(0)
+            dest_file.truncate()
+            shutil.copyfileobj(source_file, dest_file, chunk_size)
+    if preserve_metadata:
+        shutil.copystat(source, dest)
 
+
+def link_or_copy(source: Path, dest: Path):
+    """
+    Hardlink a file, copy it if linking is not possible. Only use this for files which are never modified in place.
+    """
+    if dest.exists():
+        dest.unlink()
+    try:
+        os.link(source, dest)
+    except OSError:
+        logger.debug(f"Cannot link {source} to {dest}, copying instead")
+        copy_file(source, dest)
+
+
+async def async_copy(source: Path, dest: Path, chunk_size: int = 128 * 1024):
     logger.debug(f"Copying file {source.name} from {source} to {dest}")
-    async with aiofiles.open(source, "rb") as source_file, aiofiles.open(
-            dest, "wb"
-    ) as dest_file:
-        async for chunk in read_in_chunks(source_file):
-            await dest_file.write(chunk)
+    await asyncio.get_running_loop().run_in_executor(copy_executor, copy_file, source, dest, False, chunk_size)
+
+
+async def async_link_or_copy(source: Path, dest: Path):
+    logger.debug(f"Linking file {source.name} from {source} to {dest}")
+    await asyncio.get_running_loop().run_in_executor(copy_executor, link_or_copy, source, dest)
+
+
+def _collect_tree(source: Path, dest: Path) -> Tuple[List[Path], List[Tuple[Path, Path]]]:
+    directories = []
+    files = []
+    for root, dir_names, file_names in os.walk(source):
+        relative = Path(root).relative_to(source)
+        for name in dir_names:
+            directories.append(dest / relative / name)
+        for name in file_names:
+            files.append((Path(root) / name, dest / relative / name))
+    return directories, files
 
 
-async def async_copytree(source: Path, dest: Path, override: bool = False):
+async def async_copytree(source: Path, dest: Path, override: bool = False, preserve_metadata: bool = False):
+    """
+    Copy a directory tree, copying files in parallel.
+    :param source: The directory to copy
+    :param dest: The destination directory, must be empty unless override is set
+    :param override: Allow copying into a non empty directory
+    :param preserve_metadata: Also copy permissions and modification times
+    """
     if not source.is_dir():
         raise NotADirectoryError()
     if not dest.is_dir():
@@ -31,12 +130,83 @@ async def async_copytree(source: Path, dest: Path, override: bool = False):
         dest.mkdir()
     elif any(dest.iterdir()) and not override:
         raise OSError(39)
-    for entry in source.iterdir():
-        temp = dest / entry.name
-        if entry.is_dir():
-            logger.debug(f"Creating directory {temp}")
-            temp.mkdir()
-            await async_copytree(entry, temp, override=override)
-        else:
-            logger.debug(f"Copying file {entry.name} from {entry} to {temp}")
-            await async_copy(entry, temp)
+    loop = asyncio.get_running_loop()
+    directories, files = await loop.run_in_executor(copy_executor, _collect_tree, source, dest)
+    for directory in directories:
+        directory.mkdir(exist_ok=True)
+    logger.debug(f"Copying {len(files)} files from {source} to {dest}")
+    await asyncio.gather(*[
+        loop.run_in_executor(copy_executor, copy_file, source_file, dest_file, preserve_metadata)
+        for source_file, dest_file in files
+    ])
+
+
+def _is_unchanged(source: Path, dest: Path) -> bool:
+    try:
+        source_stat = source.stat()
+        dest_stat = dest.stat()
+    except FileNotFoundError:
+        return False
+    return source_stat.st_size == dest_stat.st_size and source_stat.st_mtime_ns == dest_stat.st_mtime_ns
+
+
+def _collect_changes(source: Path, dest: Path) -> Tuple[List[Path], List[Tuple[Path, Path]], List[Path]]:
+    directories, files = _collect_tree(source, dest)
+    changed = [(source_file, dest_file) for source_file, dest_file in files
+               if not _is_unchanged(source_file, dest_file)]
+    wanted = {dest_file for _, dest_file in files}
+    stale = []
+    for root, _, file_names in os.walk(dest):
+        stale.extend(Path(root) / name for name in file_names if Path(root) / name not in wanted)
+    return directories, changed, stale
+
+
+async def async_synctree(source: Path, dest: Path) -> int:
+    """
+    Bring a copy created with async_copytree(preserve_metadata=True) up to date. Only files whose size or
+    modification time differ from the copy are copied again, files missing in source are deleted.
+    :param source: The directory to copy
+    :param dest: The previous copy of source
+    :return: The number of copied files
+    """
+    if not source.is_dir():
+        raise NotADirectoryError()
+    loop = asyncio.get_running_loop()
+    directories, changed, stale = await loop.run_in_executor(copy_executor, _collect_changes, source, dest)
+    for directory in directories:
+        directory.mkdir(exist_ok=True)
+    for path in stale:
+        path.unlink()
+    logger.debug(f"Copying {len(changed)} changed files from {source} to {dest}, deleted {len(stale)}")
+    await asyncio.gather(*[
+        loop.run_in_executor(copy_executor, copy_file, source_file, dest_file, True)
+        for source_file, dest_file in changed
+    ])
+    return len(changed)
+
+
+AT_FDCWD = -100
+RENAME_EXCHANGE = 2
+
+_renameat2 = None
+if sys.platform.startswith("linux"):
+    _renameat2 = getattr(ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True), "renameat2", None)
+
+
+def _renameat2_exchange(first: Path, second: Path) -> bool:
+    if _renameat2 is None:
+        return False
+    return _renameat2(AT_FDCWD, os.fsencode(first), AT_FDCWD, os.fsencode(second), RENAME_EXCHANGE) == 0
+
+
+def exchange_paths(first: Path, second: Path):
+    """
+    Swap two directories. Uses an atomic exchange on Linux, falls back to two renames elsewhere.
+    """
+    if _renameat2_exchange(first, second):
+        return
+    logger.debug(f"Atomic exchange not available, swapping {first} and {second} with two renames")
+    temp = first.with_name(f"{first.name}.swap")
+    os.rename(first, temp)
+    os.rename(second, first)
+    os.rename(temp, second)
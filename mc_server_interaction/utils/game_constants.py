@@ -10,3 +10,9 @@ class LevelTypes:
     FLAT = "flat"
     LARGE_BIOMES = "large_biomes"
     AMPLIFIED = "amplified"
+
+
+class Commands:
+    # prints the target tick rate and the average time per tick, available since 1.20.3
+    TICK_QUERY = "tick query"
+    TICK_QUERY_VERSION = (1, 20, 3)
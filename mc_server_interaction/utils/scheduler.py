@@ -0,0 +1,114 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+JobFunction = Callable[[], Awaitable[Optional[float]]]
+
+
+class Job:
+    def __init__(self, func: JobFunction, interval: float, name: str):
+        self.func = func
+        self.interval = interval
+        self.name = name
+        self.due = 0.0
+        self.cancelled = False
+        self.running = False
+
+
+class Scheduler:
+    """
+    Runs periodic jobs of all servers from a single task. Due jobs are kept in a heap, so the task only wakes up
+    when the next job is due and costs nothing while no job is registered.
+    A job function can return the delay until its next run to adapt its interval, otherwise the interval set
+    when adding the job is used. Runs of the same job never overlap.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(f"MCServerInteraction.{self.__class__.__name__}")
+        self._heap: List[Tuple[float, int, Job]] = []
+        self._counter = itertools.count()
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def __len__(self):
+        return sum(1 for _, _, job in self._heap if not job.cancelled)
+
+    def add_job(self, func: JobFunction, interval: float, delay: float = 0, name: Optional[str] = None) -> Job:
+        """
+        :param func: Coroutine function to run periodically
+        :param interval: Default delay in seconds between the end of one run and the start of the next one
+        :param delay: Delay in seconds before the first run
+        :param name: Name used in log messages
+        :return: The job, pass it to remove_job to stop it
+        """
+        job = Job(func, interval, name or getattr(func, "__qualname__", repr(func)))
+        self._push(job, time.monotonic() + delay)
+        return job
+
+    def remove_job(self, job: Job):
+        job.cancelled = True
+        self._heap = [entry for entry in self._heap if entry[2] is not job]
+        heapq.heapify(self._heap)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def reschedule(self, job: Job, delay: float = 0):
+        """
+        Run a job earlier than planned, for example when its result is needed now.
+        """
+        if job.cancelled or job.running:
+            return
+        due = time.monotonic() + delay
+        if due < job.due:
+            # the old heap entry is skipped because its due time no longer matches
+            self._push(job, due)
+
+    def _push(self, job: Job, due: float):
+        job.due = due
+        heapq.heappush(self._heap, (due, next(self._counter), job))
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+        elif self._heap[0][2] is job:
+            self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            while self._heap and self._is_stale(self._heap[0]):
+                heapq.heappop(self._heap)
+            if not self._heap:
+                self._task = None
+                return
+            self._wakeup.clear()
+            delay = self._heap[0][0] - time.monotonic()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            _, _, job = heapq.heappop(self._heap)
+            job.running = True
+            asyncio.create_task(self._run_job(job))
+
+    @staticmethod
+    def _is_stale(entry: Tuple[float, int, Job]) -> bool:
+        due, _, job = entry
+        return job.cancelled or due != job.due
+
+    async def _run_job(self, job: Job):
+        interval = None
+        try:
+            interval = await job.func()
+        except Exception as e:
+            self.logger.exception(f"Scheduled job {job.name} failed: {e}")
+        finally:
+            job.running = False
+        if not job.cancelled:
+            self._push(job, time.monotonic() + (job.interval if interval is None else interval))
+
+
+default_scheduler = Scheduler()
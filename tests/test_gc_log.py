@@ -0,0 +1,56 @@
+import unittest
+
+from mc_server_interaction.manager import ServerManager  # noqa: F401, loads the packages in dependency order
+from mc_server_interaction.interaction.gc_log import GcLogParser
+
+
+class GcLogParserTest(unittest.TestCase):
+    def setUp(self):
+        self.parser = GcLogParser()
+
+    def test_g1(self):
+        event = self.parser.parse(
+            "[2.345s][info][gc          ] GC(4) Pause Young (Normal) (G1 Evacuation Pause) 24M->4M(256M) 5.123ms"
+        )
+        self.assertEqual((event.gc_id, event.uptime), (4, 2.345))
+        self.assertEqual((event.name, event.cause), ("Pause Young (Normal)", "G1 Evacuation Pause"))
+        self.assertEqual((event.pause_ms, event.heap_before, event.heap_after, event.heap_committed),
+                         (5.123, 24, 4, 256))
+        event = self.parser.parse("[3.000s][info][gc          ] GC(5) Pause Remark 30M->30M(256M) 1.500ms")
+        self.assertEqual((event.name, event.cause, event.pause_ms), ("Pause Remark", None, 1.5))
+        self.assertIsNone(self.parser.parse(
+            "[2.345s][info][gc,phases   ] GC(4)   Pre Evacuate Collection Set: 0.1ms"
+        ))
+
+    def test_allocation_rate(self):
+        self.parser.parse("[1.000s][info][gc] GC(0) Pause Young (Normal) (G1 Evacuation Pause) 24M->4M(256M) 5ms")
+        event = self.parser.parse(
+            "[3.000s][info][gc] GC(1) Pause Young (Normal) (G1 Evacuation Pause) 44M->6M(256M) 4ms"
+        )
+        self.assertEqual(event.allocation_rate, 20)
+
+    def test_zgc(self):
+        event = self.parser.parse("[0.512s][info][gc,phases   ] GC(0) Pause Mark Start 0.006ms")
+        self.assertEqual((event.gc_id, event.name, event.pause_ms), (0, "Pause Mark Start", 0.006))
+        event = self.parser.parse(
+            "[0.520s][info][gc          ] GC(0) Garbage Collection (Warmup) 102M(10%)->16M(2%)"
+        )
+        self.assertEqual((event.name, event.cause, event.pause_ms), ("Garbage Collection", "Warmup", None))
+        self.assertEqual((event.heap_before, event.heap_after), (102, 16))
+
+    def test_generational_zgc(self):
+        event = self.parser.parse("[1.234s][info][gc,phases   ] GC(3) Y: Pause Mark Start (Major) 0.012ms")
+        self.assertEqual((event.gc_id, event.name, event.pause_ms), (3, "Pause Mark Start (Major)", 0.012))
+        event = self.parser.parse("[1.240s][info][gc,phases   ] GC(3) O: Pause Relocate Start 0,004ms")
+        self.assertEqual((event.name, event.pause_ms), ("Pause Relocate Start", 0.004))
+        event = self.parser.parse("[1.250s][info][gc,phases   ] GC(4) y: Pause Mark End 0.010ms")
+        self.assertEqual(event.name, "Pause Mark End")
+        event = self.parser.parse(
+            "[1.300s][info][gc          ] GC(3) Major Collection (Proactive) 120M(6%)->40M(2%) 0.055s"
+        )
+        self.assertEqual((event.name, event.cause, event.heap_after), ("Major Collection", "Proactive", 40))
+        self.assertIsNone(self.parser.parse("[1.234s][info][gc,phases   ] GC(3) Y: Young Generation"))
+
+
+if __name__ == "__main__":
+    unittest.main()
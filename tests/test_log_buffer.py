@@ -0,0 +1,49 @@
+import random
+import unittest
+
+from mc_server_interaction.manager import ServerManager  # noqa: F401, loads the packages in dependency order
+from mc_server_interaction.interaction.log_buffer import LogBuffer
+
+
+class LogBufferTest(unittest.TestCase):
+    def test_empty_line_at_write_position(self):
+        buffer = LogBuffer(max_lines=10, max_bytes=8)
+        for line in ["aaaa", "", "bbbb", "cc", "dd", "ee"]:
+            buffer.append(line)
+        self.assertEqual(list(buffer), ["cc", "dd", "ee"])
+
+    def test_buffer_grows_on_demand(self):
+        buffer = LogBuffer(max_lines=1000, max_bytes=1024)
+        self.assertEqual(len(buffer._data), 0)
+        buffer.append("a" * 100)
+        self.assertLessEqual(len(buffer._data), 1024)
+        for i in range(100):
+            buffer.append("b" * 100)
+        self.assertLessEqual(len(buffer._data), 1024)
+
+    def test_available_lines_are_never_overwritten(self):
+        rnd = random.Random(0)
+        for _ in range(200):
+            max_lines = rnd.randint(1, 12)
+            max_bytes = rnd.randint(1, 40)
+            buffer = LogBuffer(max_lines, max_bytes, compress_evicted=rnd.random() < 0.3, segment_lines=3)
+            lines = []
+            for i in range(100):
+                line = "x" * rnd.choice([0, 0, 1, 2, 3, 5, 8, 13, 50]) + str(i % 10)[:rnd.randint(0, 1)]
+                lines.append(line.encode()[:max_bytes].decode())
+                self.assertEqual(buffer.append(line), i)
+                self.assertLessEqual(buffer.next_seq - buffer._first_seq, max_lines)
+                for seq in range(buffer.first_seq, buffer.next_seq):
+                    self.assertEqual(buffer.get(seq), lines[seq])
+
+    def test_get_since(self):
+        buffer = LogBuffer(max_lines=4)
+        for i in range(6):
+            buffer.append(str(i))
+        self.assertEqual(buffer.get_since(0), (["2", "3", "4", "5"], 6))
+        self.assertEqual(buffer.get_since(3, limit=2), (["3", "4"], 5))
+        self.assertEqual(buffer.get_since(6), ([], 6))
+
+
+if __name__ == "__main__":
+    unittest.main()
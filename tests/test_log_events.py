@@ -0,0 +1,69 @@
+import unittest
+from typing import Dict, Optional
+
+from mc_server_interaction.manager import ServerManager  # noqa: F401, loads the packages in dependency order
+from mc_server_interaction.interaction.log_events import LogEventParser, ServerEventType
+
+
+class LogEventParserTest(unittest.TestCase):
+    def setUp(self):
+        self.parser = LogEventParser()
+
+    def assertEvent(self, raw: str, event_type: ServerEventType, message: str, data: Optional[Dict] = None):
+        line, event = self.parser.parse(raw)
+        self.assertIsNotNone(event, raw)
+        self.assertEqual(event.type, event_type)
+        self.assertEqual(line.message, message)
+        self.assertEqual(event.data, data or {})
+        return line
+
+    def test_vanilla(self):
+        line = self.assertEvent(
+            '[12:00:00] [Server thread/INFO]: Done (5.123s)! For help, type "help"',
+            ServerEventType.STARTED, 'Done (5.123s)! For help, type "help"', {"startup_time": 5.123}
+        )
+        self.assertEqual((line.time, line.thread, line.level), ("12:00:00", "Server thread", "INFO"))
+        self.assertEvent(
+            "[12:00:01] [Server thread/INFO]: Steve joined the game",
+            ServerEventType.PLAYER_JOINED, "Steve joined the game", {"player": "Steve"}
+        )
+        self.assertEvent("[12:00:02] [Server thread/INFO]: Stopping the server", ServerEventType.STOPPING,
+                         "Stopping the server")
+
+    def test_bukkit(self):
+        line = self.assertEvent(
+            '[12:00:00 INFO]: Done (3,5s)! For help, type "help"',
+            ServerEventType.STARTED, 'Done (3,5s)! For help, type "help"', {"startup_time": 3.5}
+        )
+        self.assertEqual((line.time, line.thread, line.level), ("12:00:00", None, "INFO"))
+        self.assertEvent("[12:00:01 INFO]: <Alex> hello there", ServerEventType.CHAT, "<Alex> hello there",
+                         {"player": "Alex", "message": "hello there"})
+        self.assertEvent("[12:00:02 INFO]: Saved the game", ServerEventType.SAVED, "Saved the game")
+
+    def test_forge(self):
+        line = self.assertEvent(
+            '[12:00:00] [Server thread/INFO] [minecraft/DedicatedServer]: Done (12.3s)! For help, type "help"',
+            ServerEventType.STARTED, 'Done (12.3s)! For help, type "help"', {"startup_time": 12.3}
+        )
+        self.assertEqual((line.time, line.thread, line.level), ("12:00:00", "Server thread", "INFO"))
+        self.assertEvent(
+            "[17Oct2026 12:00:01.123] [Server thread/INFO] [net.minecraft.server.MinecraftServer/]: "
+            "Stopping the server",
+            ServerEventType.STOPPING, "Stopping the server"
+        )
+        self.assertEvent(
+            "[12:00:02] [Server thread/INFO] [minecraft/ChunkMap]: "
+            "ThreadedAnvilChunkStorage: All dimensions are saved",
+            ServerEventType.STOPPED, "ThreadedAnvilChunkStorage: All dimensions are saved"
+        )
+
+    def test_unknown_lines(self):
+        line, event = self.parser.parse("Starting minecraft server version 1.20.1")
+        self.assertIsNone(event)
+        self.assertEqual(line.message, "Starting minecraft server version 1.20.1")
+        _, event = self.parser.parse("[12:00:00] [Server thread/INFO]: Preparing level \"world\"")
+        self.assertIsNone(event)
+
+
+if __name__ == "__main__":
+    unittest.main()